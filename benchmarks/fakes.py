@@ -0,0 +1,694 @@
+"""
+Local stand-ins for the parts of the modmail host the plugins touch.
+
+Nothing here talks to Discord or MongoDB. REST calls sleep for a simulated
+latency and can answer with a 429, which is retried after ``retry_after``
+the same way discord.py's HTTP client does.
+"""
+
+import asyncio
+import copy
+import enum
+import importlib
+import inspect
+import io
+import logging
+import random
+import re
+import sys
+import types
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+from discord.http import Route
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Plugins are imported as submodules of this package, like modmail does with
+# plugins.<user>.<repo>, so relative imports inside a plugin folder resolve.
+PLUGIN_PACKAGE = "modmail_plugins"
+
+
+def install_modmail_stubs():
+    """Register fake ``bot``, ``core`` and ``cogs`` modules so plugins can be imported."""
+    if "bot" in sys.modules:
+        return
+
+    class PermissionLevel(enum.IntEnum):
+        OWNER = 5
+        ADMINISTRATOR = 4
+        ADMIN = 4
+        MODERATOR = 3
+        MOD = 3
+        SUPPORTER = 2
+        RESPONDER = 2
+        REGULAR = 1
+        INVALID = -1
+
+    def has_permissions(permission_level=PermissionLevel.REGULAR):
+        return lambda func: func
+
+    def thread_only():
+        return lambda func: func
+
+    class UserFriendlyTime(commands.Converter):
+        pass
+
+    class ModmailHelpCommand:
+        pass
+
+    bot = types.ModuleType("bot")
+    bot.ModmailBot = FakeBot
+
+    core = types.ModuleType("core")
+    core.__path__ = []
+    checks = types.ModuleType("core.checks")
+    checks.has_permissions = has_permissions
+    checks.thread_only = thread_only
+    models = types.ModuleType("core.models")
+    models.PermissionLevel = PermissionLevel
+    models.getLogger = logging.getLogger
+    clients = types.ModuleType("core.clients")
+    clients.MongoDBClient = FakeMongoDBClient
+    thread = types.ModuleType("core.thread")
+    thread.Thread = FakeThread
+    thread.ThreadManager = FakeThreadManager
+    time = types.ModuleType("core.time")
+    time.UserFriendlyTime = UserFriendlyTime
+    core.checks = checks
+    core.models = models
+    core.clients = clients
+    core.thread = thread
+    core.time = time
+
+    cogs = types.ModuleType("cogs")
+    cogs.__path__ = []
+    utility = types.ModuleType("cogs.utility")
+    utility.PermissionLevel = PermissionLevel
+    utility.ModmailHelpCommand = ModmailHelpCommand
+    cogs.utility = utility
+
+    sys.modules.update(
+        {
+            "bot": bot,
+            "core": core,
+            "core.checks": checks,
+            "core.models": models,
+            "core.clients": clients,
+            "core.thread": thread,
+            "core.time": time,
+            "cogs": cogs,
+            "cogs.utility": utility,
+        }
+    )
+
+
+def load_plugin(name, module=None):
+    """Import ``<name>/<module>.py`` from this repository as a plugin module."""
+    install_modmail_stubs()
+    if PLUGIN_PACKAGE not in sys.modules:
+        package = types.ModuleType(PLUGIN_PACKAGE)
+        package.__path__ = [str(REPO_ROOT)]
+        sys.modules[PLUGIN_PACKAGE] = package
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{name}.{module or name}")
+
+
+async def settle(cog):
+    """Wait for a cog's config to load and the startup tasks it kicked off to run."""
+    store = getattr(cog, "store", None)
+    if store is not None:
+        await store.wait_until_loaded()
+    # Everything is in memory, a few loop iterations finish the startup tasks.
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class FakeRest:
+    """Simulated Discord REST API with latency and 429 responses."""
+
+    def __init__(self, latency=0.05, jitter=0.5, rate_limit_ratio=0.0, retry_after=1.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = Counter()
+
+    async def request(self, route):
+        self.calls[route] += 1
+        while True:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-spread, spread)))
+            if self.random.random() >= self.rate_limit_ratio:
+                return
+            self.rate_limited[route] += 1
+            await asyncio.sleep(self.retry_after)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction=1):
+        self.documents.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    """In-memory stand-in for the motor collection returned by ``plugin_db.get_partition``."""
+
+    def __init__(self):
+        self.documents = {}
+        self.operations = Counter()
+
+    OPERATORS = {
+        "$gt": lambda value, operand: value is not None and value > operand,
+        "$gte": lambda value, operand: value is not None and value >= operand,
+        "$lt": lambda value, operand: value is not None and value < operand,
+        "$lte": lambda value, operand: value is not None and value <= operand,
+        "$in": lambda value, operand: value in operand,
+    }
+
+    @classmethod
+    def _matches(cls, document, query):
+        for key, expected in query.items():
+            value = document.get(key)
+            if isinstance(expected, dict) and all(op in cls.OPERATORS for op in expected):
+                if not all(cls.OPERATORS[op](value, operand) for op, operand in expected.items()):
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    @staticmethod
+    def _parent(document, path):
+        *parents, key = path.split(".")
+        for parent in parents:
+            document = document.setdefault(parent, {})
+        return document, key
+
+    def _first(self, query):
+        return next((d for d in self.documents.values() if self._matches(d, query)), None)
+
+    async def find_one(self, query, projection=None):
+        self.operations["find_one"] += 1
+        document = self._first(query)
+        return copy.deepcopy(document) if document is not None else None
+
+    def find(self, query=None):
+        self.operations["find"] += 1
+        return FakeCursor(
+            [copy.deepcopy(d) for d in self.documents.values() if self._matches(d, query or {})]
+        )
+
+    async def delete_one(self, query):
+        self.operations["delete_one"] += 1
+        document = self._first(query)
+        if document is not None:
+            del self.documents[document["_id"]]
+
+    async def find_one_and_delete(self, query):
+        self.operations["find_one_and_delete"] += 1
+        document = self._first(query)
+        if document is not None:
+            del self.documents[document["_id"]]
+        return document
+
+    async def create_index(self, keys, **kwargs):
+        self.operations["create_index"] += 1
+
+    async def update_one(self, query, update, upsert=False):
+        self.operations["update_one"] += 1
+        self._update(query, update, upsert)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False):
+        self.operations["find_one_and_update"] += 1
+        return self._update(query, update, upsert, return_document)
+
+    def _update(self, query, update, upsert=False, return_document=False):
+        document = self._first(query)
+        if document is None:
+            if not upsert:
+                return None
+            document = dict(query)
+            document.setdefault("_id", len(self.documents))
+            document.update(copy.deepcopy(update.get("$setOnInsert", {})))
+            self.documents[document["_id"]] = document
+        before = copy.deepcopy(document)
+
+        for path, value in update.get("$set", {}).items():
+            parent, key = self._parent(document, path)
+            parent[key] = copy.deepcopy(value)
+        for path in update.get("$unset", {}):
+            parent, key = self._parent(document, path)
+            parent.pop(key, None)
+        for path, value in update.get("$inc", {}).items():
+            parent, key = self._parent(document, path)
+            parent[key] = parent.get(key, 0) + value
+        for path, value in update.get("$push", {}).items():
+            parent, key = self._parent(document, path)
+            values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            parent.setdefault(key, []).extend(copy.deepcopy(values))
+        for path, value in update.get("$addToSet", {}).items():
+            parent, key = self._parent(document, path)
+            values = parent.setdefault(key, [])
+            for item in value["$each"] if isinstance(value, dict) and "$each" in value else [value]:
+                if item not in values:
+                    values.append(copy.deepcopy(item))
+        for path, value in update.get("$pull", {}).items():
+            parent, key = self._parent(document, path)
+            removed = value["$in"] if isinstance(value, dict) and "$in" in value else [value]
+            parent[key] = [item for item in parent.get(key, []) if item not in removed]
+        return copy.deepcopy(document) if return_document else before
+
+
+class FakePluginDb:
+    def __init__(self):
+        self.partitions = defaultdict(FakeCollection)
+
+    def get_partition(self, cog):
+        return self.partitions[type(cog).__name__]
+
+
+class FakeMongoDBClient:
+    """Registered as ``core.clients.MongoDBClient``, plugins patch its methods."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.logs = FakeCollection()
+
+    async def append_log(self, message, *, message_id="", channel_id="", type_="thread_message"):
+        channel_id = str(channel_id) or str(message.channel.id)
+        data = {
+            "timestamp": str(message.created_at),
+            "message_id": str(message_id) or str(message.id),
+            "author": {"id": str(message.author.id), "name": message.author.name},
+            "content": message.content,
+            "type": type_,
+            "attachments": [{"id": a.id, "url": a.url} for a in message.attachments],
+        }
+        return await self.logs.find_one_and_update(
+            {"channel_id": channel_id}, {"$push": {"messages": data}}, return_document=True
+        )
+
+
+class FakeThreadManager:
+    """Registered as ``core.thread.ThreadManager``, plugins patch its methods."""
+
+    TOPIC_REGEX = re.compile(r"User ID: (\d+)")
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.cache = {}
+
+    async def find(self, *, recipient=None, channel=None, recipient_id=None):
+        if channel is not None:
+            for thread in self.cache.values():
+                if thread.channel == channel:
+                    return thread
+            match = self.TOPIC_REGEX.search(channel.topic or "")
+            if match is None:
+                return None
+            user = await self.bot.fetch_user(int(match.group(1)))
+            thread = self.cache[user.id] = FakeThread(user, channel, self)
+            return thread
+        return self.cache.get(recipient.id if recipient is not None else recipient_id)
+
+    async def create(self, recipient, *, message=None, creator=None, category=None, manual_trigger=True):
+        guild = self.bot.modmail_guild
+        await guild.request("POST", "/guilds/{guild_id}/channels")
+        channel = guild.add_text_channel(max(guild._channels, default=0) + 1, category and category.id)
+        thread = self.cache[recipient.id] = FakeThread(recipient, channel, self)
+        return thread
+
+
+class FakeRole:
+    def __init__(self, id, guild):
+        self.id = id
+        self.guild = guild
+        self.name = f"role-{id}"
+        self.mention = f"<@&{id}>"
+
+    @property
+    def members(self):
+        return [m for m in self.guild._members.values() if self in m.roles]
+
+
+class FakeUser:
+    def __init__(self, id):
+        self.id = id
+        self.name = self.display_name = f"user-{id}"
+        self.discriminator = "0"
+        self.bot = False
+        self.mention = f"<@{id}>"
+        self.avatar = None
+        self.display_avatar = types.SimpleNamespace(url=f"https://cdn.invalid/avatars/{id}.png")
+        self.color = self.colour = discord.Color.default()
+
+
+class FakeMember(FakeUser):
+    def __init__(self, id, guild, roles=()):
+        super().__init__(id)
+        self.guild = guild
+        self.roles = list(roles)
+
+    @property
+    def top_role(self):
+        return self.roles[-1] if self.roles else None
+
+
+class FakeCategory(discord.CategoryChannel):
+    """Passes isinstance checks against discord.CategoryChannel."""
+
+    def __init__(self, id, guild):
+        self.id = id
+        self.guild = guild
+        self.name = f"category-{id}"
+        self.position = 0
+        self.category_id = None
+
+    @property
+    def text_channels(self):
+        channels = [
+            c
+            for c in self.guild._channels.values()
+            if isinstance(c, FakeTextChannel) and c.category_id == self.id
+        ]
+        return sorted(channels, key=lambda c: (c.position, c.id))
+
+
+class FakeTextChannel(discord.TextChannel):
+    """Passes isinstance checks against discord.TextChannel."""
+
+    def __init__(self, id, guild, category_id=None, position=0):
+        self.id = id
+        self.guild = guild
+        self.name = f"channel-{id}"
+        self.category_id = category_id
+        self.position = position
+        self.topic = None
+        self.sent = []
+
+    @property
+    def category(self):
+        return self.guild.get_channel(self.category_id)
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.request("POST", "/channels/{channel_id}/messages")
+        self.sent.append(content)
+        message = FakeMessage(len(self.sent), content, self.guild.me, self)
+        if "file" in kwargs:
+            message.attachments.append(FakeAttachment(message.id))
+        return message
+
+    async def edit(self, **fields):
+        """
+        Return the edited channel as a new object, like discord.py does.
+
+        The cached channel only changes when the gateway's CHANNEL_UPDATE
+        arrives, which happens here on the next loop iteration.
+        """
+        await self.guild.request("PATCH", "/channels/{channel_id}")
+        if "category" in fields:
+            fields["category_id"] = fields.pop("category").id
+        edited = copy.copy(self)
+        self._apply(edited, fields)
+        asyncio.get_running_loop().call_soon(self._apply, self, fields)
+        return edited
+
+    @staticmethod
+    def _apply(channel, fields):
+        for name, value in fields.items():
+            setattr(channel, name, value)
+
+
+class FakeGuild:
+    def __init__(self, rest, id=1, chunked=True, can_chunk=True):
+        self.rest = rest
+        self.id = id
+        self.name = f"guild-{id}"
+        self.chunked = chunked
+        self.can_chunk = can_chunk
+        self.http = FakeHTTPClient(rest, self)
+        self.me = FakeUser(0)
+        self._members = {}
+        self._uncached = {}
+        self._roles = {}
+        self._channels = {}
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    async def request(self, method, path):
+        await self.http.request(Route(method, path))
+
+    @property
+    def categories(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeCategory)]
+
+    def add_role(self, id):
+        self._roles[id] = FakeRole(id, self)
+        return self._roles[id]
+
+    def add_member(self, id, roles=(), cached=True):
+        member = FakeMember(id, self, roles)
+        (self._members if cached else self._uncached)[id] = member
+        return member
+
+    def add_category(self, id):
+        self._channels[id] = FakeCategory(id, self)
+        return self._channels[id]
+
+    def add_text_channel(self, id, category_id=None):
+        position = len(self._channels)
+        self._channels[id] = FakeTextChannel(id, self, category_id, position)
+        return self._channels[id]
+
+    def get_role(self, id):
+        return self._roles.get(id)
+
+    def get_member(self, id):
+        return self._members.get(id)
+
+    def get_channel(self, id):
+        return self._channels.get(id)
+
+    async def fetch_member(self, id):
+        await self.request("GET", "/guilds/{guild_id}/members/{user_id}")
+        member = self._members.get(id) or self._uncached.get(id)
+        if member is None:
+            raise discord.NotFound(FakeResponse(404), "Unknown Member")
+        return member
+
+    async def chunk(self):
+        if not self.can_chunk:
+            raise discord.ClientException("Intents.members must be enabled to use this.")
+        self._members.update(self._uncached)
+        self._uncached.clear()
+        self.chunked = True
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Fake"
+
+
+class FakeHTTPClient:
+    """Every fake REST call goes through ``request``, like discord.py's HTTPClient."""
+
+    def __init__(self, rest, guild):
+        self.rest = rest
+        self.guild = guild
+
+    async def request(self, route, **kwargs):
+        await self.rest.request(f"{route.method} {route.path}")
+
+    async def bulk_channel_update(self, guild_id, payload, reason=None):
+        await self.request(Route("PATCH", "/guilds/{guild_id}/channels"))
+        for data in payload:
+            channel = self.guild.get_channel(data["id"])
+            channel.position = data["position"]
+            if "parent_id" in data:
+                channel.category_id = data["parent_id"]
+
+
+class FakeThread:
+    def __init__(self, recipient, channel, manager=None):
+        self.recipient = recipient
+        self.channel = channel
+        self.id = recipient.id
+        self.manager = manager
+        self.bot = manager.bot if manager is not None else None
+        self.close_task = None
+        self.auto_close_task = None
+        channel.topic = f"User ID: {recipient.id}"
+
+    async def send(self, message, destination=None, **kwargs):
+        await self.channel.guild.request("POST", "/channels/{channel_id}/messages")
+
+    async def reply(self, message, **kwargs):
+        # The staff copy in the thread channel and the DM to the recipient.
+        await asyncio.gather(
+            self.channel.guild.request("POST", "/channels/{channel_id}/messages"),
+            self.channel.guild.request("POST", "/channels/{channel_id}/messages"),
+        )
+
+    async def cancel_closure(self, all=False):
+        self.close_task = self.auto_close_task = None
+
+    async def close(self, *, closer, after=0, silent=False, delete_channel=True, message=None):
+        if self.manager is not None:
+            self.manager.cache.pop(self.id, None)
+        requests = [self.channel.guild.request("POST", "/channels/{channel_id}/messages")]
+        if not silent:
+            requests.append(self.channel.guild.request("POST", "/channels/{channel_id}/messages"))
+        await asyncio.gather(*requests)
+
+
+class FakeAttachment:
+    def __init__(self, id, filename="image.png", size=1024, width=64):
+        self.id = id
+        self.filename = filename
+        self.size = size
+        self.width = width
+        self.url = f"https://cdn.invalid/attachments/{id}/{filename}"
+
+    async def to_file(self):
+        return discord.File(io.BytesIO(b"\0" * self.size), filename=self.filename)
+
+
+class FakeMessage:
+    def __init__(self, id, content="", author=None, channel=None, *, mentions=(), attachments=()):
+        self.id = id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = getattr(channel, "guild", None)
+        self.mentions = list(mentions)
+        self.role_mentions = []
+        self.embeds = []
+        self.attachments = list(attachments)
+        self.created_at = datetime.now(timezone.utc)
+
+    async def add_reaction(self, emoji):
+        await self.channel.guild.request(
+            "PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"
+        )
+
+    async def delete(self):
+        await self.channel.guild.request("DELETE", "/channels/{channel_id}/messages/{message_id}")
+
+
+class FakeContext:
+    def __init__(self, bot, message, thread=None):
+        self.bot = bot
+        self.message = message
+        self.author = message.author
+        self.channel = message.channel
+        self.guild = message.guild
+        self.thread = thread
+        self.prefix = bot.prefix
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeBot:
+    def __init__(self, rest, guild):
+        self.rest = rest
+        self.modmail_guild = guild
+        self.guild = guild
+        self.plugin_db = FakePluginDb()
+        self.http = guild.http
+        self.api = FakeMongoDBClient(self)
+        self.threads = FakeThreadManager(self)
+        self.user = guild.me
+        self.prefix = "?"
+        self.config = {"require_close_reason": False}
+        self.main_color = self.error_color = 0
+        self._users = {}
+        self._guilds = {guild.id: guild}
+        self._cogs = {}
+        self.all_commands = {}
+        self.extra_events = defaultdict(list)
+
+    def add_listener(self, func, name):
+        self.extra_events[name].append(func)
+
+    def remove_listener(self, func, name):
+        if func in self.extra_events[name]:
+            self.extra_events[name].remove(func)
+
+    async def dispatch(self, event, *args):
+        await asyncio.gather(*(func(*args) for func in self.extra_events[f"on_{event}"]))
+
+    def add_command(self, command):
+        self.all_commands[command.name] = command
+
+    def remove_command(self, name):
+        return self.all_commands.pop(name, None)
+
+    async def add_cog(self, cog):
+        self._cogs[cog.qualified_name] = cog
+        for name, func in cog.get_listeners():
+            self.add_listener(func, name)
+        await cog.cog_load()
+
+    async def remove_cog(self, name):
+        cog = self._cogs.pop(name)
+        for listener, func in cog.get_listeners():
+            self.remove_listener(func, listener)
+        result = cog.cog_unload()
+        if inspect.isawaitable(result):
+            await result
+
+    async def get_context(self, message):
+        thread = next(
+            (t for t in self.threads.cache.values() if t.channel == message.channel), None
+        )
+        return FakeContext(self, message, thread)
+
+    async def wait_until_ready(self):
+        pass
+
+    def add_guild(self, guild):
+        """Join another guild, its REST calls go through this bot's HTTP client."""
+        guild.http = self.http
+        self._guilds[guild.id] = guild
+
+    def get_guild(self, id):
+        return self._guilds.get(id)
+
+    def get_cog(self, name):
+        return self._cogs.get(name)
+
+    def get_user(self, id):
+        return self._users.get(id)
+
+    async def fetch_user(self, id):
+        await self.http.request(Route("GET", "/users/{user_id}"))
+        return self._users.setdefault(id, FakeUser(id))
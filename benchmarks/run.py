@@ -0,0 +1,388 @@
+"""
+Benchmark the plugins' event handlers offline and save the results as JSON.
+
+Run from the repository root with discord.py installed:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+    python -m benchmarks.run --only suspend --latency 0
+
+Every benchmark gets a fresh fake bot and guild, calls one handler
+``--iterations`` times with up to ``--concurrency`` calls in flight, and
+records per-call latency, throughput, CPU time and the REST and database
+calls the handler made. ``--latency 0`` measures the handlers' own cost.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import discord
+
+from benchmarks.fakes import (
+    REPO_ROOT,
+    FakeAttachment,
+    FakeBot,
+    FakeContext,
+    FakeGuild,
+    FakeMessage,
+    FakeRest,
+    FakeThread,
+    load_plugin,
+    percentile,
+    settle,
+)
+
+BENCHMARKS = {}
+
+STAFF_ROLE = 50
+PENDING_CATEGORY = 60
+OPEN_CATEGORY = 61
+BACKUP_CHANNEL = 70
+STAFF_ID = 100
+RECIPIENT_ID = 10_000
+
+
+def benchmark(name):
+    """Register a benchmark, a coroutine setting up an ``Environment`` and returning its handler call."""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+class Environment:
+    """A fake bot and guild with one staff member and a modmail thread per iteration."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rest = FakeRest(
+            latency=args.latency,
+            jitter=args.jitter,
+            rate_limit_ratio=args.rate_limit_ratio,
+            retry_after=args.retry_after,
+            seed=args.seed,
+        )
+        self.guild = FakeGuild(self.rest)
+        self.bot = FakeBot(self.rest, self.guild)
+        self.cogs = []
+
+        self.staff_role = self.guild.add_role(STAFF_ROLE)
+        self.staff = self.guild.add_member(STAFF_ID, [self.staff_role])
+        self.guild.add_category(OPEN_CATEGORY)
+        self.guild.add_category(PENDING_CATEGORY)
+        self.guild.add_text_channel(BACKUP_CHANNEL)
+
+        self.threads = []
+        for index in range(args.iterations):
+            recipient = self.guild.add_member(RECIPIENT_ID + index)
+            self.bot._users[recipient.id] = recipient
+            channel = self.guild.add_text_channel(RECIPIENT_ID + index, OPEN_CATEGORY)
+            thread = FakeThread(recipient, channel, self.bot.threads)
+            self.bot.threads.cache[recipient.id] = thread
+            self.threads.append(thread)
+
+    def hit(self):
+        """Whether the next message is one the handler acts on, see ``--hit-ratio``."""
+        return self.rng.random() < self.args.hit_ratio
+
+    def seed_config(self, cog_name, config):
+        self.bot.plugin_db.partitions[cog_name].documents["config"] = {
+            "_id": "config",
+            "version": 0,
+            **config,
+        }
+
+    async def load(self, plugin, cog_name):
+        cog = getattr(load_plugin(plugin), cog_name)(self.bot)
+        await self.bot.add_cog(cog)
+        await settle(cog)
+        self.cogs.append(cog)
+        return cog
+
+    def staff_message(self, index, content, **kwargs):
+        return FakeMessage(index, content, self.staff, self.threads[index].channel, **kwargs)
+
+    async def close(self):
+        for cog in self.cogs:
+            await self.bot.remove_cog(cog.qualified_name)
+
+
+@benchmark("impersonation.on_message")
+async def impersonation_on_message(env):
+    env.seed_config("Impersonation", {"allowed_roles": [STAFF_ROLE]})
+    await env.load("impersonation", "Impersonation")
+
+    def call(index):
+        if env.hit():
+            content = f"?impersonate {env.threads[index].id} Hello from the recipient"
+        else:
+            content = "Thanks, looking into it now."
+        return env.bot.dispatch("message", env.staff_message(index, content))
+
+    return call
+
+
+@benchmark("pendingclose.on_message")
+async def pendingclose_on_message(env):
+    env.seed_config(
+        "PendingClose",
+        {
+            "pending_category": str(PENDING_CATEGORY),
+            "additional_categories": [OPEN_CATEGORY],
+            "original_categories": {},
+        },
+    )
+    await env.load("pendingClose", "PendingClose")
+
+    def call(index):
+        content = "?close in 2h" if env.hit() else "Thanks, looking into it now."
+        return env.bot.dispatch("message", env.staff_message(index, content))
+
+    return call
+
+
+@benchmark("reactonping.on_message")
+async def reactonping_on_message(env):
+    env.seed_config("ReactOnPing", {"reaction_emoji": "🔔", "excluded_roles": []})
+    await env.load("reactOnPing", "ReactOnPing")
+
+    def call(index):
+        mentions = [env.threads[index].recipient] if env.hit() else []
+        message = env.staff_message(index, "Thanks, looking into it now.", mentions=mentions)
+        return env.bot.dispatch("message", message)
+
+    return call
+
+
+@benchmark("router.on_message")
+async def router_on_message(env):
+    """All three message plugins subscribed at once, each message aimed at one of them or none."""
+    await impersonation_on_message(env)
+    await pendingclose_on_message(env)
+    await reactonping_on_message(env)
+
+    def call(index):
+        mentions = []
+        content = "Thanks, looking into it now."
+        if env.hit():
+            kind = env.rng.randrange(3)
+            if kind == 0:
+                content = f"?impersonate {env.threads[index].id} Hello from the recipient"
+            elif kind == 1:
+                content = "?close in 2h"
+            else:
+                mentions = [env.threads[index].recipient]
+        message = env.staff_message(index, content, mentions=mentions)
+        return env.bot.dispatch("message", message)
+
+    return call
+
+
+@benchmark("premiumsupport.on_thread_ready")
+async def premiumsupport_on_thread_ready(env):
+    premium_role = env.guild.add_role(51)
+    premium_category = env.guild.add_category(62)
+    env.seed_config(
+        "PremiumSupport",
+        {
+            "tiers": {
+                "premium": {
+                    "name": "premium",
+                    "priority": 0,
+                    "roles": [premium_role.id],
+                    "message": "Thanks for being a premium member!",
+                    "mention": "@here",
+                    "category": premium_category.id,
+                }
+            }
+        },
+    )
+    for thread in env.threads:
+        if env.hit():
+            thread.recipient.roles.append(premium_role)
+    cog = await env.load("premiumsupport", "PremiumSupport")
+
+    def call(index):
+        thread = env.threads[index]
+        return cog.on_thread_ready(thread, None, None, FakeMessage(index, "Hi", thread.recipient))
+
+    return call
+
+
+@benchmark("filebackup.append_log")
+async def filebackup_append_log(env):
+    env.seed_config("FileBackup", {"config": {"backup_channel": BACKUP_CHANNEL}})
+    await env.load("fileBackup", "FileBackup")
+    for thread in env.threads:
+        await env.bot.api.logs.find_one_and_update(
+            {"channel_id": str(thread.channel.id)}, {"$set": {"messages": []}}, upsert=True
+        )
+
+    def call(index):
+        attachments = [FakeAttachment(index)] if env.hit() else []
+        message = env.staff_message(index, "Here's the screenshot.", attachments=attachments)
+        return env.bot.api.append_log(message, channel_id=env.threads[index].channel.id)
+
+    return call
+
+
+@benchmark("suspend.suspend")
+async def suspend_suspend(env):
+    cog = await env.load("suspend", "Suspend")
+
+    def call(index):
+        ctx = FakeContext(env.bot, env.staff_message(index, "?suspend"), env.threads[index])
+        return cog.suspend.callback(cog, ctx, "")
+
+    return call
+
+
+async def run_benchmark(name, args):
+    env = Environment(args)
+    call = await BENCHMARKS[name](env)
+    env.rest.calls.clear()
+    env.rest.rate_limited.clear()
+    collections = [env.bot.api.logs, *env.bot.plugin_db.partitions.values()]
+    for collection in collections:
+        collection.operations.clear()
+
+    latencies = []
+    errors = Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def timed(index):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(index)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(index) for index in range(args.iterations)))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    # Config writes are flushed when the cogs unload, count them too.
+    await env.close()
+    db_calls = {}
+    for collection in collections:
+        for operation, count in collection.operations.items():
+            db_calls[operation] = db_calls.get(operation, 0) + count
+
+    return {
+        "iterations": args.iterations,
+        "errors": dict(errors),
+        "elapsed": elapsed,
+        "throughput": args.iterations / elapsed,
+        "cpu_per_call": cpu / args.iterations,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        },
+        "rest_calls": dict(env.rest.calls),
+        "rate_limited": dict(env.rest.rate_limited),
+        "db_calls": db_calls,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print each benchmark's change against a previous run."""
+    print(f"{'benchmark':32} {'p50':>10} {'p99':>10} {'throughput':>12} {'cpu/call':>10}")
+    for name, result in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            continue
+        changes = [
+            (result["latency"]["p50"], before["latency"]["p50"]),
+            (result["latency"]["p99"], before["latency"]["p99"]),
+            (result["throughput"], before["throughput"]),
+            (result["cpu_per_call"], before["cpu_per_call"]),
+        ]
+        columns = [f"{(new / old - 1) * 100:+.1f}%" if old else "n/a" for new, old in changes]
+        print(f"{name:32} {columns[0]:>10} {columns[1]:>10} {columns[2]:>12} {columns[3]:>10}")
+
+
+async def run(args):
+    names = [
+        name
+        for name in BENCHMARKS
+        if not args.only or any(name.startswith(prefix) for prefix in args.only)
+    ]
+    results = {}
+    for name in names:
+        results[name] = await run_benchmark(name, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500, help="handler calls per benchmark")
+    parser.add_argument("--concurrency", type=int, default=50, help="handler calls in flight")
+    parser.add_argument(
+        "--hit-ratio",
+        type=float,
+        default=0.2,
+        help="share of calls the handler acts on, e.g. messages that are commands or mentions",
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency spread as a fraction")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only", nargs="+", metavar="PREFIX", help="run the benchmarks starting with PREFIX"
+    )
+    parser.add_argument("--output", default="bench_output.json", help="where to write the results")
+    parser.add_argument("--compare", metavar="FILE", help="a previous --output to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "discord.py": discord.__version__,
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "benchmarks": asyncio.run(run(args)),
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    else:
+        print(json.dumps(results["benchmarks"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
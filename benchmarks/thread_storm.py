@@ -0,0 +1,156 @@
+"""
+Load test PremiumSupport.on_thread_ready with a storm of threads opening at once.
+
+Run from the repository root with discord.py installed:
+
+    python -m benchmarks.thread_storm --threads 500 --latency 0.08 --rate-limit-ratio 0.02
+
+With ``--guilds`` the premium roles live in other guilds than the modmail
+guild, like a community guild, and every recipient is a member of each.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.fakes import (
+    FakeBot,
+    FakeGuild,
+    FakeMessage,
+    FakeRest,
+    FakeThread,
+    load_plugin,
+    percentile,
+    settle,
+)
+
+
+async def run(args):
+    rest = FakeRest(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    rng = random.Random(args.seed)
+
+    guild = FakeGuild(rest, chunked=args.cached_ratio >= 1, can_chunk=not args.no_chunk)
+    bot = FakeBot(rest, guild)
+    premium_guilds = []
+    for index in range(args.guilds):
+        premium_guild = FakeGuild(
+            rest, id=2 + index, chunked=args.cached_ratio >= 1, can_chunk=not args.no_chunk
+        )
+        bot.add_guild(premium_guild)
+        premium_guilds.append(premium_guild)
+
+    tiers = []
+    for index in range(args.tiers):
+        role_guild = premium_guilds[index % len(premium_guilds)] if premium_guilds else guild
+        role = role_guild.add_role(100 + index)
+        category = guild.add_category(200 + index)
+        tiers.append(
+            {
+                "name": f"tier{index}",
+                "priority": index,
+                "roles": [role.id],
+                "message": "Thanks for being a premium member!",
+                "mention": "@here",
+                "category": category.id,
+            }
+        )
+    await bot.plugin_db.partitions["PremiumSupport"].find_one_and_update(
+        {"_id": "config"},
+        {"$set": {"tiers": tiers, "guilds": [g.id for g in premium_guilds]}},
+        upsert=True,
+    )
+
+    threads = []
+    for user_id in range(10_000, 10_000 + args.threads):
+        roles = {g.id: [] for g in [guild, *premium_guilds]}
+        if rng.random() < args.premium_ratio:
+            role_id = rng.choice(tiers)["roles"][0]
+            for role_guild in [guild, *premium_guilds]:
+                if (role := role_guild.get_role(role_id)) is not None:
+                    roles[role_guild.id].append(role)
+        member = guild.add_member(user_id, roles[guild.id], cached=rng.random() < args.cached_ratio)
+        for premium_guild in premium_guilds:
+            premium_guild.add_member(
+                user_id, roles[premium_guild.id], cached=rng.random() < args.cached_ratio
+            )
+        channel = guild.add_text_channel(user_id)
+        threads.append(FakeThread(member, channel))
+
+    module = load_plugin("premiumsupport")
+    cog = module.PremiumSupport(bot)
+    await settle(cog)
+    rest.calls.clear()
+    rest.rate_limited.clear()
+
+    latencies = []
+
+    async def open_thread(thread):
+        if args.spread:
+            await asyncio.sleep(rng.uniform(0, args.spread))
+        start = time.perf_counter()
+        await cog.on_thread_ready(thread, None, None, FakeMessage(thread.id))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(open_thread(thread) for thread in threads))
+    elapsed = time.perf_counter() - start
+    await cog.cog_unload()
+
+    return {
+        "threads": args.threads,
+        "elapsed": elapsed,
+        "throughput": args.threads / elapsed,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        },
+        "actions": {
+            name: {"p50": percentile(list(values), 50), "p99": percentile(list(values), 99)}
+            for name, values in cog.action_latency.items()
+        },
+        "rest_calls": dict(rest.calls),
+        "rate_limited": dict(rest.rate_limited),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=300)
+    parser.add_argument("--tiers", type=int, default=2)
+    parser.add_argument(
+        "--guilds", type=int, default=0, help="other guilds holding the premium roles"
+    )
+    parser.add_argument("--premium-ratio", type=float, default=0.3)
+    parser.add_argument(
+        "--cached-ratio",
+        type=float,
+        default=1.0,
+        help="share of members in the member cache, below 1 the guild is not chunked",
+    )
+    parser.add_argument(
+        "--no-chunk",
+        action="store_true",
+        help="fail member chunking, as without the members intent",
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency spread as a fraction")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--spread", type=float, default=0.0, help="seconds over which threads open")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
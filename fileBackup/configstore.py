@@ -0,0 +1,217 @@
+"""
+Cached plugin config, shared by the plugins in this repository.
+
+Modmail installs every plugin folder on its own, so each plugin ships an
+identical copy of this module. Keep the copies in sync.
+"""
+
+import asyncio
+import functools
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+# Seconds between version checks when change streams aren't available.
+POLL_INTERVAL = 30
+
+# Edits are written once they've been quiet for FLUSH_DELAY seconds, but
+# never held back longer than FLUSH_MAX_DELAY.
+FLUSH_DELAY = 1
+FLUSH_MAX_DELAY = 5
+
+# Seconds before edits that failed to save are written again.
+RETRY_DELAY = 10
+
+
+def config_required(func):
+    """Make a cog listener wait until the cog's config store has loaded."""
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        await self.store.wait_until_loaded()
+        return await func(self, *args, **kwargs)
+
+    return wrapper
+
+
+class ConfigStore:
+    """
+    Cached copy of a plugin's ``config`` document.
+
+    Every write bumps the document's ``version``. Each bot instance watches
+    the document, or polls its version where MongoDB has no change streams,
+    and reloads it when another instance changed it.
+
+    ``on_load`` is called with the config document on the first load and
+    after every reload.
+
+    Edits are queued as field-level updates (``set``, ``unset``,
+    ``add_to_set`` and ``pull``) and a burst of them goes out as one write.
+    Field paths use MongoDB's dot notation.
+    """
+
+    def __init__(self, db, defaults, on_load):
+        self.db = db
+        self.defaults = defaults
+        self.on_load = on_load
+        self.version = None
+        self._loaded = asyncio.Event()
+        self._task = None
+
+        # Queued updates, each one a MongoDB update document. A new one is
+        # started when an edit would conflict with the last one.
+        self._pending = []
+        self._first_edit = None
+        self._flush_handle = None
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._stale = False
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        await self.flush()
+
+    async def wait_until_loaded(self):
+        await self._loaded.wait()
+
+    async def load(self):
+        config = await self.db.find_one_and_update(
+            {"_id": "config"},
+            {"$setOnInsert": {**self.defaults, "version": 0}},
+            upsert=True,
+            return_document=True,
+        )
+        self.version = config.get("version", 0)
+        self.on_load(config)
+        self._loaded.set()
+
+    def set(self, field, value):
+        self._queue("$set", field, value)
+
+    def unset(self, field):
+        self._queue("$unset", field, "")
+
+    def add_to_set(self, field, value):
+        self._queue("$addToSet", field, value)
+
+    def pull(self, field, value):
+        self._queue("$pull", field, value)
+
+    def _queue(self, operator, field, value):
+        update = self._pending[-1] if self._pending else None
+        if update is None or self._conflicts(update, operator, field):
+            update = {}
+            self._pending.append(update)
+
+        fields = update.setdefault(operator, {})
+        if operator == "$addToSet":
+            fields.setdefault(field, {"$each": []})["$each"].append(value)
+        elif operator == "$pull":
+            fields.setdefault(field, {"$in": []})["$in"].append(value)
+        else:
+            fields[field] = value
+        self._schedule_flush()
+
+    @staticmethod
+    def _conflicts(update, operator, field):
+        """Whether MongoDB would reject ``field`` under ``operator`` in ``update``."""
+        for other_operator, fields in update.items():
+            for other in fields:
+                if other == field:
+                    if other_operator != operator:
+                        return True
+                elif other.startswith(field + ".") or field.startswith(other + "."):
+                    return True
+        return False
+
+    def _schedule_flush(self):
+        loop = asyncio.get_running_loop()
+        if self._first_edit is None:
+            self._first_edit = loop.time()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        delay = min(FLUSH_DELAY, self._first_edit + FLUSH_MAX_DELAY - loop.time())
+        self._flush_handle = loop.call_later(max(delay, 0), self._start_flush)
+
+    def _start_flush(self):
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Write every queued edit now."""
+        self._first_edit = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        async with self._flush_lock:
+            config = None
+            while self._pending:
+                update = self._pending.pop(0)
+                try:
+                    config = await self.db.find_one_and_update(
+                        {"_id": "config"},
+                        {**update, "$inc": {"version": 1}},
+                        upsert=True,
+                        return_document=True,
+                    )
+                except Exception as e:
+                    logger.error("Failed to save plugin config %s, retrying: %s", update, e)
+                    # Keep the edits and their order for the retry.
+                    self._pending.insert(0, update)
+                    self._flush_handle = asyncio.get_running_loop().call_later(
+                        RETRY_DELAY, self._start_flush
+                    )
+                    return
+                if self.version is not None and config["version"] != self.version + 1:
+                    # Another instance wrote in between. Its changes are picked
+                    # up once every queued edit is written, a reload from an
+                    # earlier document would undo the edits still queued.
+                    self._stale = True
+                self.version = config["version"]
+
+            if self._stale and config is not None:
+                self._stale = False
+                self.on_load(config)
+
+    async def refresh(self):
+        """Reload the config if another instance changed it."""
+        if self._pending:
+            # Local edits are newer, the flush will pick up remote changes.
+            return
+        config = await self.db.find_one({"_id": "config"}, {"version": True})
+        if config is not None and config.get("version", 0) != self.version:
+            await self.load()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.load()
+                break
+            except Exception as e:
+                logger.error("Failed to load plugin config: %s", e)
+                await asyncio.sleep(POLL_INTERVAL)
+
+        try:
+            await self._watch()
+        except Exception:
+            # Change streams need a replica set, fall back to polling.
+            await self._poll()
+
+    async def _watch(self):
+        async with self.db.watch([{"$match": {"documentKey._id": "config"}}]) as stream:
+            async for _ in stream:
+                await self.refresh()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Failed to refresh plugin config: %s", e)
@@ -1,4 +1,3 @@
-import asyncio
 import json
 
 import discord
@@ -11,6 +10,9 @@ from core import checks
 from core.clients import MongoDBClient
 from core.models import PermissionLevel
 
+from .configstore import ConfigStore
+from .instrumentation import get_metrics
+
 
 async def append_log_with_backup(
     self: MongoDBClient,
@@ -22,6 +24,8 @@ async def append_log_with_backup(
 ):
     bot: ModmailBot = self.bot
     cog = bot.get_cog("FileBackup")
+    if message.attachments and type(cog) is FileBackup:
+        await cog.store.wait_until_loaded()
     if (
         not message.attachments
         or type(cog) is not FileBackup
@@ -51,8 +55,9 @@ async def append_log_with_backup(
                 allowed_mentions=discord.AllowedMentions.none()
             )
             url = msg.attachments[0].url
-        except:
-            pass
+        except Exception as e:
+            # The log keeps the original URL when the backup fails.
+            cog.metrics.record_error(cog, e)
         attachements.append(
             {
                 "id": a.id,
@@ -105,27 +110,25 @@ class FileBackup(commands.Cog):
         self.bot = bot
         self.db = bot.plugin_db.get_partition(self)
         self.config = {}
+        self.metrics = get_metrics(bot)
 
         if not hasattr(MongoDBClient, "old_append_log"):
             MongoDBClient.old_append_log = MongoDBClient.append_log
-        MongoDBClient.append_log = append_log_with_backup
+        MongoDBClient.append_log = self.metrics.wrap(self, "append_log", append_log_with_backup)
+
+        self.store = ConfigStore(self.db, {"config": {}}, self._set_val)
+        self.store.start()
+        self.metrics.instrument(self)
 
-        asyncio.create_task(self._fetch_db())
+    async def cog_unload(self):
+        self.metrics.release(self)
+        await self.store.close()
 
     def get_config(self):
         return self.config
 
-    async def _update_db(self):
-        await self.db.find_one_and_update(
-            {"_id": "config"},
-            {"$set": {"config": self.config}},
-            upsert=True,
-        )
-
-    async def _fetch_db(self):
-        config = await self.db.find_one({"_id": "config"})
-        if config:
-            self.config = config.get("config", {})
+    def _set_val(self, config):
+        self.config = config.get("config", {})
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @commands.group(invoke_without_command=True)
@@ -162,14 +165,14 @@ class FileBackup(commands.Cog):
             )
         if channel is None:
             self.config.pop("backup_channel", None)
-            await self._update_db()
+            self.store.unset("config.backup_channel")
             await ctx.send(
                 "Unset backup channel. Files won't be backed up anymore!\n"
                 f"To set a channel, run `{self.bot.prefix}backupconfig channel <new channel>`"
             )
         else:
             self.config["backup_channel"] = channel.id
-            await self._update_db()
+            self.store.set("config.backup_channel", channel.id)
             await ctx.send(f"Backup channel set to: `{channel.id}`")
 
     @checks.has_permissions(PermissionLevel.ADMIN)
@@ -177,7 +180,7 @@ class FileBackup(commands.Cog):
     async def nonstaff(self, ctx: commands.Context, *, value: bool):
         """Toggle if attachements from non-staff should be backed up. Defaults to true."""
         self.config["backup_non_staff"] = value
-        await self._update_db()
+        self.store.set("config.backup_non_staff", value)
         await ctx.send(f"Backup non-staff set to: `{value}`")
 
 
@@ -2,7 +2,13 @@ import re
 import discord
 from discord.ext import commands
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
+
+from .configstore import ConfigStore, config_required
+from .instrumentation import get_metrics
+from .messagerouter import get_router
+
+logger = getLogger(__name__)
 
 
 class Impersonation(commands.Cog):
@@ -12,40 +18,30 @@ class Impersonation(commands.Cog):
         self.bot = bot
         self.db = bot.plugin_db.get_partition(self)
         self.allowed_roles = []
-        bot.loop.create_task(self._set_val())
-
-    async def _update_db(self):
-        """Save current config to database"""
-        await self.db.find_one_and_update(
-            {'_id': 'config'},
-            {'$set': {
-                'allowed_roles': self.allowed_roles
-            }},
-            upsert=True
-        )
+        self.store = ConfigStore(self.db, {'allowed_roles': []}, self._set_val)
+        self.store.start()
+        self.router = get_router(bot)
+        self.metrics = get_metrics(bot)
+        self.metrics.instrument(self, 'handle_message')
 
-    async def _set_val(self):
-        """Retrieve configuration from database"""
-        config = await self.db.find_one({'_id': 'config'})
-        
-        if config is None:
-            await self.db.find_one_and_update(
-                {'_id': 'config'},
-                {'$set': {
-                    'allowed_roles': []
-                }},
-                upsert=True
-            )
-            return
-        
+    async def cog_load(self):
+        self.router.subscribe(self.qualified_name, self.handle_message, lambda: [('command', '?impersonate')])
+
+    async def cog_unload(self):
+        self.router.unsubscribe(self.qualified_name)
+        self.metrics.release(self)
+        await self.store.close()
+
+    def _set_val(self, config):
+        """Apply configuration loaded from database"""
         self.allowed_roles = config.get('allowed_roles', [])
 
     def _has_allowed_role(self, member):
         """Check if member has any allowed role"""
         return any(role.id in self.allowed_roles for role in member.roles)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    @config_required
+    async def handle_message(self, message):
         """Listen for messages with impersonate command"""
         if not message.content.startswith('?impersonate'):
             return
@@ -82,6 +78,7 @@ class Impersonation(commands.Cog):
             await self._do_impersonate_direct(ctx, user, message_content)
             
         except (ValueError, IndexError, Exception) as e:
+            self.metrics.record_error(self, e)
             await message.add_reaction('❌')
 
     # @commands.command(name="impersonate")
@@ -114,14 +111,14 @@ class Impersonation(commands.Cog):
                 member_to_impersonate = ctx.guild.get_member(user.id)
                 if not member_to_impersonate:
                     member_to_impersonate = await ctx.guild.fetch_member(user.id)
-            except:
-                pass  # User might not be in the server
+            except Exception as e:
+                self.metrics.record_error(self, e)  # User might not be in the server
             
             # Delete the original command message
             try:
                 await ctx.message.delete()
-            except (discord.NotFound, discord.Forbidden):
-                pass
+            except (discord.NotFound, discord.Forbidden) as e:
+                self.metrics.record_error(self, e)
             
             # Create fake message object for impersonation
             class FakeAuthor:
@@ -177,13 +174,13 @@ class Impersonation(commands.Cog):
             # Send the impersonated message directly through thread
             await ctx.thread.reply(fake_message)
                 
-        except ValueError:
-            await ctx.message.add_reaction('❌')
-        except discord.NotFound:
+        except (ValueError, discord.NotFound) as e:
+            self.metrics.record_error(self, e)
             await ctx.message.add_reaction('❌')
         except Exception as e:
+            self.metrics.record_error(self, e)
+            logger.error("Impersonation failed: %s", e)
             await ctx.message.add_reaction('❌')
-            print(f"Impersonation error: {e}")  # For debugging
 
     @commands.group(name="impersonateconfig", invoke_without_command=True)
     @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
@@ -223,7 +220,7 @@ class Impersonation(commands.Cog):
             return
             
         self.allowed_roles.append(role.id)
-        await self._update_db()
+        self.store.add_to_set('allowed_roles', role.id)
         await ctx.send(f"Added {role.name} to allowed impersonation roles.")
 
     @impersonateconfig.command(name="removerole")
@@ -235,7 +232,7 @@ class Impersonation(commands.Cog):
             return
             
         self.allowed_roles.remove(role.id)
-        await self._update_db()
+        self.store.pull('allowed_roles', role.id)
         await ctx.send(f"Removed {role.name} from allowed impersonation roles.")
 
 
@@ -0,0 +1,105 @@
+"""
+Shared on_message dispatcher for the plugins in this repository.
+
+Modmail installs every plugin folder on its own, so each plugin ships an
+identical copy of this module. Keep the copies in sync.
+"""
+
+import asyncio
+
+from core.models import getLogger
+
+logger = getLogger(__name__)
+
+
+def get_router(bot):
+    """Return the bot's message router, creating it on first use."""
+    router = getattr(bot, "plugin_message_router", None)
+    if router is None:
+        router = bot.plugin_message_router = MessageRouter(bot)
+    return router
+
+
+class MessageRouter:
+    """
+    Classifies every message once and calls only the handlers interested in it.
+
+    Handlers subscribe with a function returning the keys they care about:
+
+    - ``("command", word)``: the message starts with ``word``, e.g. ``"?close"``
+    - ``("mentions",)``: the message mentions a user or a role
+    - ``("category", category_id)``: the message was sent in that category
+    - ``("bot_embed", category_id)``: the bot sent an embed in that category
+
+    The keys are collected into an index when subscriptions change or
+    ``refresh`` is called, so a message nobody is interested in costs a few
+    dict lookups.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._subscriptions = {}  # name: (handler, keys)
+        self._index = {}  # key: [handler]
+        self._kinds = set()
+        self._prefix = None
+
+    def subscribe(self, name, handler, keys):
+        if not self._subscriptions:
+            self.bot.add_listener(self.dispatch, "on_message")
+        self._subscriptions[name] = (handler, keys)
+        self.refresh()
+
+    def unsubscribe(self, name):
+        self._subscriptions.pop(name, None)
+        if not self._subscriptions:
+            self.bot.remove_listener(self.dispatch, "on_message")
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the index, call it when a subscriber's keys change."""
+        self._prefix = self.bot.prefix
+        index = {}
+        for handler, keys in self._subscriptions.values():
+            for key in keys():
+                index.setdefault(key, []).append(handler)
+        self._index = index
+        self._kinds = {key[0] for key in index}
+
+    def _message_keys(self, message):
+        keys = []
+        if "command" in self._kinds and message.content:
+            keys.append(("command", (message.content.split(None, 1) or [""])[0]))
+        if "mentions" in self._kinds and (message.mentions or message.role_mentions):
+            keys.append(("mentions",))
+        category_id = getattr(message.channel, "category_id", None)
+        if category_id is not None:
+            if "category" in self._kinds:
+                keys.append(("category", category_id))
+            if (
+                "bot_embed" in self._kinds
+                and message.embeds
+                and message.author.id == self.bot.user.id
+            ):
+                keys.append(("bot_embed", category_id))
+        return keys
+
+    async def dispatch(self, message):
+        if self.bot.prefix != self._prefix:
+            self.refresh()
+
+        handlers = []
+        for key in self._message_keys(message):
+            for handler in self._index.get(key, ()):
+                if handler not in handlers:
+                    handlers.append(handler)
+        if not handlers:
+            return
+
+        results = await asyncio.gather(
+            *(handler(message) for handler in handlers), return_exceptions=True
+        )
+        for handler, result in zip(handlers, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Error in message handler %s.", handler.__qualname__, exc_info=result
+                )
@@ -1,9 +1,12 @@
-import asyncio
 import discord
 from discord.ext import commands
 from core import checks
 from core.models import PermissionLevel
 
+from .configstore import ConfigStore, config_required
+from .instrumentation import get_metrics
+from .messagerouter import get_router
+
 class PendingClose(commands.Cog):
     """Move thread to a pending close category when a timed close is initiated."""
 
@@ -13,39 +16,41 @@ class PendingClose(commands.Cog):
         self.pending_category = None
         self.additional_categories = []
         self.original_categories = {}  # tracks channel_id: original_category_id
-        asyncio.create_task(self._set_val())
-
-    async def _update_db(self):
-        """Save current config to database"""
-        await self.db.find_one_and_update(
-            {'_id': 'config'},
-            {'$set': {
-                'pending_category': self.pending_category,
-                'additional_categories': self.additional_categories,
-                'original_categories': self.original_categories
-            }},
-            upsert=True
+        self.router = get_router(bot)
+        self.store = ConfigStore(
+            self.db,
+            {
+                'pending_category': None,
+                'additional_categories': [],
+                'original_categories': {}
+            },
+            self._set_val
         )
-
-    async def _set_val(self):
-        """Retrieve configuration from database"""
-        config = await self.db.find_one({'_id': 'config'})
-        
-        if config is None:
-            await self.db.find_one_and_update(
-                {'_id': 'config'},
-                {'$set': {
-                    'pending_category': None,
-                    'additional_categories': [],
-                    'original_categories': {}
-                }},
-                upsert=True
-            )
-            return
-        
+        self.store.start()
+        self.metrics = get_metrics(bot)
+        self.metrics.instrument(self, 'handle_message')
+
+    async def cog_load(self):
+        self.router.subscribe(self.qualified_name, self.handle_message, self._message_keys)
+
+    async def cog_unload(self):
+        self.router.unsubscribe(self.qualified_name)
+        self.metrics.release(self)
+        await self.store.close()
+
+    def _message_keys(self):
+        """Messages worth looking at: close commands and cancel embeds in the pending category"""
+        keys = [('command', f'{self.bot.prefix}close')]
+        if self.pending_category:
+            keys.append(('bot_embed', int(self.pending_category)))
+        return keys
+
+    def _set_val(self, config):
+        """Apply configuration loaded from database"""
         self.pending_category = config.get('pending_category')
         self.additional_categories = config.get('additional_categories', [])
         self.original_categories = config.get('original_categories', {})
+        self.router.refresh()
 
     async def _restore_original_category(self, channel):
         """Restore channel to its original category"""
@@ -56,14 +61,14 @@ class PendingClose(commands.Cog):
                 if original_category:
                     await channel.edit(category=original_category)
                 del self.original_categories[str(channel.id)]
-                await self._update_db()
+                self.store.unset(f'original_categories.{channel.id}')
                 return True
-            except Exception:
-                pass
+            except Exception as e:
+                self.metrics.record_error(self, e)
         return False
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    @config_required
+    async def handle_message(self, message):
         """Handle thread moves and cancellations"""
         if not isinstance(message.channel, discord.TextChannel):
             return
@@ -121,12 +126,14 @@ class PendingClose(commands.Cog):
                     # Store original category before moving
                     if channel.category_id != int(self.pending_category):
                         self.original_categories[str(channel.id)] = str(channel.category_id)
-                        await self._update_db()
+                        self.store.set(f'original_categories.{channel.id}', str(channel.category_id))
                         
                     await channel.edit(category=pending_category)
-                except discord.Forbidden:
+                except discord.Forbidden as e:
+                    self.metrics.record_error(self, e)
                     await channel.send("I don't have permission to move this channel.")
                 except Exception as e:
+                    self.metrics.record_error(self, e)
                     await channel.send(f"Error moving channel: {str(e)}")
 
     @commands.group(invoke_without_command=True)
@@ -164,7 +171,8 @@ class PendingClose(commands.Cog):
             return await ctx.send(embed=embed)
 
         self.pending_category = str(category.id)
-        await self._update_db()
+        self.store.set('pending_category', self.pending_category)
+        self.router.refresh()
 
         embed = discord.Embed(
             title="Success",
@@ -182,7 +190,7 @@ class PendingClose(commands.Cog):
             return
             
         self.additional_categories.append(category)
-        await self._update_db()
+        self.store.add_to_set('additional_categories', category)
         await ctx.send(f"Added category {category} to the pending close check list.")
 
     @pendingconfig.command(name="remove")
@@ -194,7 +202,7 @@ class PendingClose(commands.Cog):
             return
             
         self.additional_categories.remove(category)
-        await self._update_db()
+        self.store.pull('additional_categories', category)
         await ctx.send(f"Removed category {category} from the pending close check list.")
 
     @pendingconfig.command(name="list")
@@ -1,12 +1,59 @@
 import asyncio
 import datetime
+import re
+import time
+from collections import OrderedDict, defaultdict, deque
 
 import discord
 from discord.ext import commands
 
 from bot import ModmailBot
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
+
+from .configstore import ConfigStore, config_required
+from .instrumentation import get_metrics
+
+logger = getLogger(__name__)
+
+DEFAULT_TIER = "premium"
+
+# Channels we didn't place ourselves sort below every tier.
+UNRANKED = float("inf")
+
+# Seconds a looked up premium status is trusted for members of guilds
+# that aren't in the member cache.
+STATUS_TTL = 300
+STATUS_CACHE_SIZE = 10_000
+
+
+def new_tier(name, priority=0):
+    return {
+        "name": name,
+        "priority": priority,
+        "roles": [],
+        "message": "",
+        "mention": "",
+        "category": 0,
+    }
+
+
+class PremiumRole(commands.Converter):
+    """A role of the current guild, or the ID or mention of a role in another premium guild."""
+
+    async def convert(self, ctx, argument):
+        try:
+            return await commands.RoleConverter().convert(ctx, argument)
+        except commands.RoleNotFound:
+            pass
+        match = re.fullmatch(r"<@&(\d+)>|(\d+)", argument)
+        if match:
+            role_id = int(match.group(1) or match.group(2))
+            for guild in ctx.cog._premium_guilds():
+                role = guild.get_role(role_id)
+                if role is not None:
+                    return role
+        raise commands.RoleNotFound(argument)
 
 
 class PremiumSupport(commands.Cog):
@@ -16,77 +63,397 @@ class PremiumSupport(commands.Cog):
         self.bot = bot
         self.db = bot.plugin_db.get_partition(self)
 
-        self.roles = []
-        self.message = ""
-        self.mention = ""
-        self.category = 0
-
-        asyncio.create_task(self._set_val())
-
-    async def _update_db(self):
-        await self.db.find_one_and_update(
-            {"_id": "config"},
-            {
-                "$set": {
-                    "roles": self.roles,
-                    "message": self.message,
-                    "mention": self.mention,
-                    "category": self.category,
-                }
-            },
-            upsert=True,
+        # Support tiers, a lower priority number is served first.
+        self.tiers = []
+        self._role_tiers = {}
+
+        # Guilds premium roles are looked up in besides the modmail guild.
+        self.guild_ids = []
+
+        # Tier of every premium guild member holding a premium role, kept
+        # current from the gateway so thread creation doesn't need a REST call.
+        # The index is complete for the guilds in _ready_guilds.
+        self.premium_members = {}
+        self._ready_guilds = set()
+
+        # user_id: (expiry, tier) of members looked up in the other guilds,
+        # oldest first, and the lookups in flight.
+        self._status_cache = OrderedDict()
+        self._lookups = {}
+
+        # Recent latencies (seconds) of the actions run for premium threads.
+        self.action_latency = defaultdict(lambda: deque(maxlen=100))
+
+        # category_id: {channel_id: priority} of the threads we placed there.
+        self._placed = defaultdict(dict)
+        self._pending_moves = defaultdict(list)
+        self._move_tasks = {}
+
+        self.store = ConfigStore(self.db, {"tiers": {}, "guilds": []}, self._set_val)
+        self.store.start()
+        asyncio.create_task(self._build_index())
+
+        self.metrics = get_metrics(bot)
+        self.metrics.instrument(self)
+
+    async def cog_unload(self):
+        self.metrics.release(self)
+        await self.store.close()
+
+    def _set_val(self, config):
+        self.guild_ids = config.get("guilds", [])
+
+        # Tiers are stored by name so a tier's fields can be updated on their own.
+        if isinstance(config.get("tiers"), dict):
+            self.tiers = list(config["tiers"].values())
+        elif "tiers" in config:
+            self.tiers = config["tiers"]
+            self.store.set("tiers", {tier["name"]: tier for tier in self.tiers})
+        elif config.get("roles"):
+            # Config from before tiers existed becomes the default tier.
+            tier = new_tier(DEFAULT_TIER)
+            tier.update(
+                roles=config.get("roles", []),
+                message=config.get("message", ""),
+                mention=config.get("mention", ""),
+                category=config.get("category") or 0,
+            )
+            self.tiers = [tier]
+            self.store.set("tiers", {DEFAULT_TIER: tier})
+
+        self._reindex()
+
+    def _get_tier(self, name):
+        return discord.utils.find(lambda t: t["name"] == name.lower(), self.tiers)
+
+    def _index_tiers(self):
+        """Map every premium role to the highest priority tier that lists it."""
+        self.tiers.sort(key=lambda t: t["priority"])
+        self._role_tiers = {}
+        for tier in self.tiers:
+            for role_id in tier["roles"]:
+                self._role_tiers.setdefault(role_id, tier)
+
+    def _member_tier(self, member):
+        tiers = [
+            self._role_tiers[role.id]
+            for role in member.roles
+            if role.id in self._role_tiers
+        ]
+        return min(tiers, key=lambda t: t["priority"], default=None)
+
+    def _premium_guilds(self):
+        """The modmail guild and the other guilds premium roles are looked up in."""
+        guilds = [self.bot.modmail_guild] if self.bot.modmail_guild is not None else []
+        for guild_id in self.guild_ids:
+            guild = self.bot.get_guild(guild_id)
+            if guild is not None and guild not in guilds:
+                guilds.append(guild)
+        return guilds
+
+    def _best_tier(self, members):
+        tiers = [
+            tier for member in members if (tier := self._member_tier(member)) is not None
+        ]
+        return min(tiers, key=lambda t: t["priority"], default=None)
+
+    def _reindex(self):
+        """Rebuild the premium member index from the member caches."""
+        self._index_tiers()
+        self._status_cache.clear()
+        members = {}
+        ready = set()
+        for guild in self._premium_guilds():
+            for role_id, tier in self._role_tiers.items():
+                role = guild.get_role(role_id)
+                if role is None:
+                    continue
+                for member in role.members:
+                    best = members.get(member.id)
+                    if best is None or tier["priority"] < best["priority"]:
+                        members[member.id] = tier
+            if guild.chunked:
+                ready.add(guild.id)
+        self.premium_members = members
+        self._ready_guilds = ready
+
+    async def _build_index(self):
+        await self.store.wait_until_loaded()
+        await self.bot.wait_until_ready()
+        await asyncio.gather(*(self._chunk(guild) for guild in self._premium_guilds()))
+        self._reindex()
+
+    @staticmethod
+    async def _chunk(guild):
+        if not guild.chunked:
+            try:
+                await guild.chunk()
+            except discord.ClientException:
+                # Members intent is disabled, we fall back to fetching members.
+                pass
+
+    async def _get_member_tier(self, recipient_id):
+        tier = self.premium_members.get(recipient_id)
+        if tier is not None:
+            return tier
+
+        # Only guilds missing from the member cache can still make them premium.
+        guilds = [g for g in self._premium_guilds() if g.id not in self._ready_guilds]
+        if not guilds:
+            return None
+
+        expiry, tier = self._status_cache.get(recipient_id, (0, None))
+        if expiry > time.monotonic():
+            return tier
+
+        task = self._lookups.get(recipient_id)
+        if task is None:
+            # Threads opening together for one recipient share a lookup.
+            task = self._lookups[recipient_id] = asyncio.create_task(
+                self._lookup_tier(recipient_id, guilds)
+            )
+            task.add_done_callback(lambda _: self._lookups.pop(recipient_id, None))
+        return await task
+
+    async def _lookup_tier(self, recipient_id, guilds):
+        """Look the recipient up in every guild at once and cache their tier."""
+        results = await asyncio.gather(
+            *(self._find_member(guild, recipient_id) for guild in guilds),
+            return_exceptions=True,
         )
+        members = []
+        failed = False
+        for guild, result in zip(guilds, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to look up member %s in %s: %s", recipient_id, guild, result)
+                self.metrics.record_error(self, result)
+                failed = True
+            elif result is not None:
+                members.append(result)
 
-    async def _set_val(self):
-        config = await self.db.find_one({"_id": "config"})
+        tier = self._best_tier(members)
+        if not failed or tier is not None:
+            cache = self._status_cache
+            now = time.monotonic()
+            cache.pop(recipient_id, None)
+            # Every entry lives for STATUS_TTL, so the oldest entries expire
+            # first and are the ones evicted when the cache is full.
+            while cache and (
+                len(cache) >= STATUS_CACHE_SIZE or next(iter(cache.values()))[0] <= now
+            ):
+                cache.popitem(last=False)
+            cache[recipient_id] = (now + STATUS_TTL, tier)
+        return tier
 
-        if config:
-            self.roles = config.get("roles", [])
-            self.message = config.get("message", "")
-            self.mention = config.get("mention", "")
-            self.category = config.get("category", "")
+    @staticmethod
+    async def _find_member(guild, user_id):
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        try:
+            return await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+
+    def _update_member(self, user_id):
+        """Recompute a member's tier from the member caches after a change."""
+        self._status_cache.pop(user_id, None)
+        tier = self._best_tier(
+            member
+            for guild in self._premium_guilds()
+            if (member := guild.get_member(user_id)) is not None
+        )
+        if tier is not None:
+            self.premium_members[user_id] = tier
+        else:
+            self.premium_members.pop(user_id, None)
+
+    def _is_premium_guild(self, guild):
+        return guild == self.bot.modmail_guild or guild.id in self.guild_ids
 
     @commands.Cog.listener()
+    @config_required
+    async def on_member_update(self, before, after):
+        if not self._is_premium_guild(after.guild) or before.roles == after.roles:
+            return
+        self._update_member(after.id)
+
+    @commands.Cog.listener()
+    @config_required
+    async def on_member_remove(self, member):
+        if self._is_premium_guild(member.guild):
+            self._update_member(member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self._placed.get(channel.category_id, {}).pop(channel.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        # A thread moved elsewhere, e.g. by PendingClose or by hand, no longer
+        # takes part in ordering the category we placed it in.
+        if before.category_id != after.category_id:
+            self._placed.get(before.category_id, {}).pop(before.id, None)
+
+    @commands.Cog.listener()
+    @config_required
     async def on_thread_ready(self, thread, creator, category, initial_message):
         if isinstance(thread.recipient, int):
             recipient_id = thread.recipient
+            recipient = self.bot.get_user(recipient_id)
         else:
             recipient_id = thread.recipient.id
-        recipient = await self.bot.modmail_guild.fetch_member(recipient_id)
-        premium = False
-        for role in recipient.roles:
-            if role.id in self.roles:
-                premium = True
+            recipient = thread.recipient
 
-        if not premium:
+        tier = await self._get_member_tier(recipient_id)
+        if tier is None:
             return
 
+        # Each action hits a different rate limit bucket, so they can run side
+        # by side. The move is started first and sends its request before
+        # the others, so the thread lands in the premium category first.
+        actions = []
+        if tier["category"]:
+            actions.append(self._run_action("move", self._move_thread(thread, tier)))
+
+        if tier["message"]:
+            actions.append(
+                self._run_action(
+                    "message",
+                    self._send_message(
+                        thread, recipient or recipient_id, tier, initial_message
+                    ),
+                )
+            )
+
+        if tier["mention"]:
+            actions.append(
+                self._run_action("mention", thread.channel.send(tier["mention"]))
+            )
+
+        await asyncio.gather(*actions)
+
+    async def _run_action(self, name, coro):
+        """Run a single premium action, recording its latency and any failure."""
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            logger.error("Premium support %s failed: %s", name, e)
+            self.metrics.record_error(self, e)
+        finally:
+            self.action_latency[name].append(time.perf_counter() - start)
+
+    async def _send_message(self, thread, recipient, tier, initial_message):
+        if isinstance(recipient, int):
+            recipient = await self.bot.fetch_user(recipient)
+
         class Author:
             roles = []
-            id = recipient_id
+            id = recipient.id
 
         class Msg:
-            content = self.message
+            content = tier["message"]
             author = Author
             created_at = datetime.datetime.now()
             id = initial_message.id
             attachments = []
             stickers = []
 
-        if Msg.content:
-            await thread.send(Msg, destination=recipient, from_mod=True, anonymous=True)
+        await thread.send(Msg, destination=recipient, from_mod=True, anonymous=True)
 
-        if self.mention:
-            await thread.channel.send(self.mention)
+    async def _move_thread(self, thread, tier):
+        category = thread.channel.guild.get_channel(tier["category"])
+        if not isinstance(category, discord.CategoryChannel):
+            raise ValueError(f"category {tier['category']} not found")
 
-        if self.category:
-            await thread.channel.move(
-                end=True,
-                category=discord.utils.get(
-                    thread.channel.guild.channels, id=self.category
-                ),
+        future = asyncio.get_running_loop().create_future()
+        self._placed[category.id][thread.channel.id] = tier["priority"]
+        if category.id in self._move_tasks:
+            # An update is in flight, this thread goes out with the next one.
+            self._pending_moves[category.id].append((thread.channel, future))
+        else:
+            # Nothing in flight, send the update from this task so the move
+            # goes out before the thread's other actions.
+            self._move_tasks[category.id] = asyncio.current_task()
+            try:
+                await self._send_moves(category, [(thread.channel, future)])
+            finally:
+                if self._pending_moves[category.id]:
+                    self._move_tasks[category.id] = asyncio.create_task(
+                        self._flush_moves(category)
+                    )
+                else:
+                    del self._move_tasks[category.id]
+        await future
+
+    async def _flush_moves(self, category):
+        """
+        Move the queued threads into a category with one position update.
+
+        Threads queued while a request is in flight go out together in the
+        next one, so a burst of premium threads costs a handful of requests
+        instead of one per thread.
+        """
+        try:
+            while self._pending_moves[category.id]:
+                await self._send_moves(category, self._pending_moves.pop(category.id))
+        finally:
+            del self._move_tasks[category.id]
+
+    async def _send_moves(self, category, batch):
+        try:
+            await self.bot.http.bulk_channel_update(
+                category.guild.id,
+                self._position_payload(category, batch),
                 reason="Premium support plugin.",
             )
+        except Exception as e:
+            # The threads stay where they were, stop ranking them here.
+            placed = self._placed[category.id]
+            for channel, future in batch:
+                placed.pop(channel.id, None)
+                future.set_exception(e)
+        else:
+            for _, future in batch:
+                future.set_result(None)
+
+    def _position_payload(self, category, batch):
+        """Order a category's channels by tier, keeping arrival order within a tier."""
+        ranks = self._placed[category.id]
+        channels = sorted(category.text_channels, key=lambda c: (c.position, c.id))
+        # Threads from earlier batches might not show up in the cache yet.
+        present = {c.id for c in channels}
+        channels += [
+            channel
+            for channel_id in ranks
+            if channel_id not in present
+            and (channel := category.guild.get_channel(channel_id))
+        ]
+        channels.sort(key=lambda c: ranks.get(c.id, UNRANKED))
+
+        moving = {channel.id for channel, _ in batch}
+        payload = []
+        for position, channel in enumerate(channels):
+            data = {"id": channel.id, "position": position}
+            if channel.id in moving:
+                data.update(parent_id=category.id, lock_permissions=False)
+            payload.append(data)
+        return payload
+
+    async def _edit_tier(self, ctx, name, field, value):
+        tier = self._get_tier(name)
+        if tier is None:
+            if name.lower() != DEFAULT_TIER:
+                return await ctx.send(f"Tier `{name}` does not exist.")
+            tier = new_tier(DEFAULT_TIER)
+            self.tiers.append(tier)
+            self.store.set(f"tiers.{DEFAULT_TIER}", tier)
+
+        tier[field] = value
+        self._reindex()
+        self.store.set(f"tiers.{tier['name']}.{field}", value)
+        await ctx.send(f"Premium {field} of tier `{tier['name']}` set to: `{value}`")
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @commands.group(invoke_without_command=True, aliases=["pc"])
@@ -96,26 +463,32 @@ class PremiumSupport(commands.Cog):
 
         To view your settings, use [p]premiumconfig.
 
-        To edit, use [p]premiumconfig <thingyouwanttoedit> <newvalue>
+        To edit the default tier, use [p]premiumconfig <thingyouwanttoedit> <newvalue>
+        To edit another tier, use [p]premiumconfig tier <thingyouwanttoedit> <tier> <newvalue>
         """
         embed = discord.Embed(colour=self.bot.main_color)
         embed.set_author(
             name="Premium Support Configurations:", icon_url=self.bot.user.avatar.url
         )
-        embed.add_field(name="Premium Roles", value=f"`{self.roles}`", inline=False)
-        embed.add_field(
-            name="Premium Message",
-            value=f"{'`' + self.message + '`' if self.message else 'None'}",
-            inline=False,
-        )
+        for tier in self.tiers:
+            embed.add_field(
+                name=f"Tier {tier['name']} (priority {tier['priority']})",
+                value=(
+                    f"Roles: `{tier['roles']}`\n"
+                    f"Message: {'`' + tier['message'] + '`' if tier['message'] else 'None'}\n"
+                    f"Mention: {'`' + tier['mention'] + '`' if tier['mention'] else 'None'}\n"
+                    f"Category: `{tier['category']}`"
+                ),
+                inline=False,
+            )
+        if not self.tiers:
+            embed.description = "No premium tiers configured."
         embed.add_field(
-            name="Mention Message",
-            value=f"{'`' + self.mention + '`' if self.message else 'None'}",
+            name="Premium Guilds",
+            value="\n".join(f"{guild.name} (`{guild.id}`)" for guild in self._premium_guilds())
+            or "None",
             inline=False,
         )
-        embed.add_field(
-            name="Premium Category", value=f"`{self.category}`", inline=False
-        )
         embed.set_footer(
             text=f"To change use {self.bot.prefix}premiumconfig <thing> <value>. Use {self.bot.prefix}help premiumconfig for the list of things you can change."
         )
@@ -123,35 +496,134 @@ class PremiumSupport(commands.Cog):
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @premiumconfig.command(aliases=["role"])
-    async def roles(self, ctx, roles: commands.Greedy[discord.Role]):
-        """Set premium roles."""
-        self.roles = [role.id for role in roles]
-        await self._update_db()
-        await ctx.send(f"Premium roles set to: `{self.roles}`")
+    async def roles(self, ctx, roles: commands.Greedy[PremiumRole]):
+        """
+        Set premium roles of the default tier.
+
+        Roles of other premium guilds are given by ID.
+        """
+        await self._edit_tier(ctx, DEFAULT_TIER, "roles", [role.id for role in roles])
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @premiumconfig.command()
     async def message(self, ctx, *, message):
-        """Set premium message reply."""
-        self.message = message
-        await self._update_db()
-        await ctx.send(f"Premium message set to: `{self.message}`")
+        """Set premium message reply of the default tier."""
+        await self._edit_tier(ctx, DEFAULT_TIER, "message", message)
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @premiumconfig.command()
     async def mention(self, ctx, *, message):
-        """Set on_premium mention message."""
-        self.mention = message
-        await self._update_db()
-        await ctx.send(f"Mention message set to: `{self.mention}`")
+        """Set on_premium mention message of the default tier."""
+        await self._edit_tier(ctx, DEFAULT_TIER, "mention", message)
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @premiumconfig.command()
     async def category(self, ctx, category_id: int = 0):
-        """Set premium category id. 0 equals none."""
-        self.category = category_id
-        await self._update_db()
-        await ctx.send(f"Premium category set to: `{self.category}`")
+        """Set premium category id of the default tier. 0 equals none."""
+        await self._edit_tier(ctx, DEFAULT_TIER, "category", category_id)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @premiumconfig.group(name="guild", invoke_without_command=True)
+    async def premium_guild(self, ctx):
+        """
+        Manage the guilds premium roles are looked up in.
+
+        The modmail guild is always included. A recipient is premium when
+        they hold a premium role in any of these guilds.
+        """
+        await ctx.send_help(ctx.command)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @premium_guild.command(name="add")
+    async def premium_guild_add(self, ctx, guild_id: int):
+        """Look up premium roles in another guild the bot is in."""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return await ctx.send(f"I'm not in a guild with ID `{guild_id}`.")
+        if self._is_premium_guild(guild):
+            return await ctx.send(f"`{guild.name}` is already a premium guild.")
+        self.guild_ids.append(guild.id)
+        self.store.add_to_set("guilds", guild.id)
+        self._reindex()
+        asyncio.create_task(self._build_index())
+        await ctx.send(f"Premium roles are now also looked up in `{guild.name}`.")
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @premium_guild.command(name="remove")
+    async def premium_guild_remove(self, ctx, guild_id: int):
+        """Stop looking up premium roles in a guild."""
+        if guild_id not in self.guild_ids:
+            return await ctx.send(f"`{guild_id}` is not a premium guild.")
+        self.guild_ids.remove(guild_id)
+        self.store.pull("guilds", guild_id)
+        self._reindex()
+        await ctx.send(f"Premium roles are no longer looked up in `{guild_id}`.")
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @premiumconfig.group(invoke_without_command=True)
+    async def tier(self, ctx):
+        """Manage premium support tiers."""
+        await ctx.send_help(ctx.command)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="add")
+    async def tier_add(self, ctx, name: str, priority: int = 0):
+        """Add a tier. Threads of lower priority tiers are placed higher."""
+        if self._get_tier(name) is not None:
+            return await ctx.send(f"Tier `{name}` already exists.")
+        if "." in name or name.startswith("$"):
+            return await ctx.send("Tier names can't contain `.` or start with `$`.")
+        tier = new_tier(name.lower(), priority)
+        self.tiers.append(tier)
+        self._reindex()
+        self.store.set(f"tiers.{tier['name']}", tier)
+        await ctx.send(f"Added tier `{name.lower()}` with priority `{priority}`.")
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="remove")
+    async def tier_remove(self, ctx, name: str):
+        """Remove a tier."""
+        tier = self._get_tier(name)
+        if tier is None:
+            return await ctx.send(f"Tier `{name}` does not exist.")
+        self.tiers.remove(tier)
+        self._reindex()
+        self.store.unset(f"tiers.{tier['name']}")
+        await ctx.send(f"Removed tier `{tier['name']}`.")
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="priority")
+    async def tier_priority(self, ctx, name: str, priority: int):
+        """Set the priority of a tier."""
+        await self._edit_tier(ctx, name, "priority", priority)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="roles", aliases=["role"])
+    async def tier_roles(self, ctx, name: str, roles: commands.Greedy[PremiumRole]):
+        """
+        Set the roles of a tier.
+
+        Roles of other premium guilds are given by ID.
+        """
+        await self._edit_tier(ctx, name, "roles", [role.id for role in roles])
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="message")
+    async def tier_message(self, ctx, name: str, *, message):
+        """Set the message reply of a tier."""
+        await self._edit_tier(ctx, name, "message", message)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="mention")
+    async def tier_mention(self, ctx, name: str, *, message):
+        """Set the mention message of a tier."""
+        await self._edit_tier(ctx, name, "mention", message)
+
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @tier.command(name="category")
+    async def tier_category(self, ctx, name: str, category_id: int = 0):
+        """Set the category id of a tier. 0 equals none."""
+        await self._edit_tier(ctx, name, "category", category_id)
 
 
 async def setup(bot):
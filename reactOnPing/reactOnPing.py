@@ -1,7 +1,24 @@
+import asyncio
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Optional
+
 import discord
 from discord.ext import commands
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
+
+from .configstore import ConfigStore, config_required
+from .instrumentation import get_metrics
+from .messagerouter import get_router
+
+logger = getLogger(__name__)
+
+# Seconds between writes of the collected mention counts.
+STATS_FLUSH_INTERVAL = 60
+
+# Longest period pingreact stats looks back over, in days.
+STATS_MAX_DAYS = 365
 
 
 class ReactOnPing(commands.Cog):
@@ -12,39 +29,86 @@ class ReactOnPing(commands.Cog):
         self.db = bot.plugin_db.get_partition(self)
         self.reaction_emoji = None  # will be set from config
         self.excluded_roles = []  # list of role IDs to ignore
-        bot.loop.create_task(self._set_val())
-
-    async def _update_db(self):
-        """Save current config to database"""
-        await self.db.find_one_and_update(
-            {'_id': 'config'},
-            {'$set': {
-                'reaction_emoji': self.reaction_emoji,
-                'excluded_roles': self.excluded_roles
-            }},
-            upsert=True
+        # (target, channel_id, hour): mentions not written yet, target is
+        # "u<user id>" or "r<role id>"
+        self.mention_counts = Counter()
+        self.store = ConfigStore(
+            self.db,
+            {
+                'reaction_emoji': None,
+                'excluded_roles': []
+            },
+            self._set_val
         )
+        self.store.start()
+        self.router = get_router(bot)
+        self.metrics = get_metrics(bot)
+        self.metrics.instrument(self, 'handle_message')
+        self._stats_task = asyncio.create_task(self._flush_mentions_periodically())
 
-    async def _set_val(self):
-        """Retrieve configuration from database"""
-        config = await self.db.find_one({'_id': 'config'})
-        
-        if config is None:
-            await self.db.find_one_and_update(
-                {'_id': 'config'},
-                {'$set': {
-                    'reaction_emoji': None,
-                    'excluded_roles': []
-                }},
-                upsert=True
-            )
-            return
-        
+    async def cog_load(self):
+        self.router.subscribe(self.qualified_name, self.handle_message, lambda: [('mentions',)])
+
+    async def cog_unload(self):
+        self.router.unsubscribe(self.qualified_name)
+        self.metrics.release(self)
+        self._stats_task.cancel()
+        await self.flush_mentions()
+        await self.store.close()
+
+    def _set_val(self, config):
+        """Apply configuration loaded from database"""
         self.reaction_emoji = config.get('reaction_emoji', "🔔")
         self.excluded_roles = config.get('excluded_roles', [])
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    def _count_mentions(self, message):
+        """Count the users and roles a message mentions in its channel and hour"""
+        if message.author.bot:
+            return
+        hour = message.created_at.replace(minute=0, second=0, microsecond=0)
+        for user in message.mentions:
+            self.mention_counts[(f'u{user.id}', message.channel.id, hour)] += 1
+        for role in message.role_mentions:
+            self.mention_counts[(f'r{role.id}', message.channel.id, hour)] += 1
+
+    async def _flush_mentions_periodically(self):
+        try:
+            await self.db.create_index('hour')
+        except Exception as e:
+            logger.warning("Failed to index mention stats: %s", e)
+        while True:
+            await asyncio.sleep(STATS_FLUSH_INTERVAL)
+            await self.flush_mentions()
+
+    async def flush_mentions(self):
+        """Write the collected mention counts, one upsert per hour"""
+        counts, self.mention_counts = self.mention_counts, Counter()
+        hours = defaultdict(Counter)
+        for (target, channel_id, hour), count in counts.items():
+            hours[hour][(target, channel_id, hour)] = count
+
+        for hour, hour_counts in hours.items():
+            try:
+                await self.db.update_one(
+                    {'_id': f'mentions-{hour:%Y%m%d%H}'},
+                    {
+                        '$setOnInsert': {'type': 'mentions', 'hour': hour},
+                        '$inc': {
+                            f'counts.{channel_id}.{target}': count
+                            for (target, channel_id, _), count in hour_counts.items()
+                        },
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.error("Failed to save mention stats: %s", e)
+                self.metrics.record_error(self, e)
+                # Try again with the next flush.
+                self.mention_counts.update(hour_counts)
+
+    @config_required
+    async def handle_message(self, message):
+        self._count_mentions(message)
         if len(message.mentions):
             # Don't react if no emoji is set or author has excluded role
             if not self.reaction_emoji:
@@ -90,7 +154,7 @@ class ReactOnPing(commands.Cog):
     async def set_emoji(self, ctx, emoji: str):
         """Set the emoji to use for ping reactions"""
         self.reaction_emoji = emoji
-        await self._update_db()
+        self.store.set('reaction_emoji', emoji)
         await ctx.send(f"Ping reaction emoji set to {emoji}")
 
     @pingreact.command(name="addrole")
@@ -102,7 +166,7 @@ class ReactOnPing(commands.Cog):
             return
             
         self.excluded_roles.append(str(role.id))
-        await self._update_db()
+        self.store.add_to_set('excluded_roles', str(role.id))
         await ctx.send(f"Added {role.name} to excluded roles.")
 
     @pingreact.command(name="removerole")
@@ -114,8 +178,61 @@ class ReactOnPing(commands.Cog):
             return
             
         self.excluded_roles.remove(str(role.id))
-        await self._update_db()
+        self.store.pull('excluded_roles', str(role.id))
         await ctx.send(f"Removed {role.name} from excluded roles.")
 
+    @staticmethod
+    def _target_mention(target):
+        kind, target_id = target[0], target[1:]
+        return f"<@{target_id}>" if kind == 'u' else f"<@&{target_id}>"
+
+    @pingreact.command(name="stats")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def stats(self, ctx, days: Optional[int] = 7, channel: discord.TextChannel = None):
+        """Show who got mentioned most, where and at what time of day"""
+        if not 1 <= days <= STATS_MAX_DAYS:
+            await ctx.send(f"Days must be between 1 and {STATS_MAX_DAYS}.")
+            return
+        await self.flush_mentions()
+        since = discord.utils.utcnow() - timedelta(days=days)
+
+        targets, channels, hours = Counter(), Counter(), Counter()
+        async for record in self.db.find({'type': 'mentions', 'hour': {'$gte': since}}):
+            for channel_id, channel_counts in record['counts'].items():
+                if channel is not None and channel_id != str(channel.id):
+                    continue
+                for target, count in channel_counts.items():
+                    targets[target] += count
+                    channels[channel_id] += count
+                    hours[record['hour'].hour] += count
+
+        scope = f" in {channel.mention}" if channel else ""
+        embed = discord.Embed(
+            title="Mention Stats",
+            description=f"{sum(targets.values())} mentions{scope} in the last {days} days.",
+            color=self.bot.main_color
+        )
+        if targets:
+            embed.add_field(
+                name="Most Mentioned",
+                value="\n".join(
+                    f"{self._target_mention(target)}: {count}"
+                    for target, count in targets.most_common(10)
+                ),
+                inline=False
+            )
+            if channel is None:
+                embed.add_field(
+                    name="Channels",
+                    value="\n".join(f"<#{channel_id}>: {count}" for channel_id, count in channels.most_common(5)),
+                    inline=False
+                )
+            embed.add_field(
+                name="Busiest Hours (UTC)",
+                value="\n".join(f"{hour:02}:00: {count}" for hour, count in hours.most_common(5)),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(ReactOnPing(bot))
@@ -0,0 +1,255 @@
+"""
+Listener and command metrics, shared by the plugins in this repository.
+
+Modmail installs every plugin folder on its own, so each plugin ships an
+identical copy of this module. Keep the copies in sync.
+"""
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import os
+import time
+from collections import Counter
+
+from aiohttp import web
+from discord.ext import commands
+
+from core import checks
+from core.models import PermissionLevel, getLogger
+
+logger = getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set PLUGIN_METRICS_PORT to serve the metrics in Prometheus' text format
+# on http://PLUGIN_METRICS_HOST:PLUGIN_METRICS_PORT/metrics.
+PORT_VARIABLE = "PLUGIN_METRICS_PORT"
+HOST_VARIABLE = "PLUGIN_METRICS_HOST"
+
+
+def get_metrics(bot):
+    """Return the bot's plugin metrics, creating them on first use."""
+    metrics = getattr(bot, "plugin_metrics", None)
+    if metrics is None:
+        metrics = bot.plugin_metrics = Metrics(bot)
+    return metrics
+
+
+class HandlerStats:
+    """Counters of one listener, command or handler."""
+
+    __slots__ = ("calls", "total", "buckets", "errors", "handled", "rest")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.errors = Counter()  # exception type: count, raised out of the handler
+        self.handled = Counter()  # exception type: count, caught by the handler
+        self.rest = Counter()  # "METHOD /path": count
+
+    def observe(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile, None past the last bucket."""
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class Metrics:
+    """
+    Call counts, latency histograms, REST calls and exceptions per handler.
+
+    Cogs call ``instrument`` in ``__init__`` and ``release`` when they
+    unload. REST calls are attributed to the handler they were made from,
+    including tasks it started, by wrapping ``bot.http.request``.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.stats = {}  # (cog, kind, name): HandlerStats
+        self._cogs = set()
+        self._current = contextvars.ContextVar("plugin_handler", default=None)
+        self._request = None
+        self._endpoint_task = None
+
+    def instrument(self, cog, *handlers):
+        """Wrap the cog's listeners and commands, and the named handler methods."""
+        if not self._cogs:
+            self._start()
+        self._cogs.add(cog.qualified_name)
+
+        for method_name in {method_name for _, method_name in cog.__cog_listeners__}:
+            setattr(cog, method_name, self.wrap(cog, method_name, getattr(cog, method_name), "listener"))
+        for command in cog.walk_commands():
+            command.callback = self.wrap(cog, command.qualified_name, command.callback, "command")
+        for method_name in handlers:
+            setattr(cog, method_name, self.wrap(cog, method_name, getattr(cog, method_name)))
+
+    def release(self, cog):
+        self._cogs.discard(cog.qualified_name)
+        if not self._cogs:
+            self._stop()
+
+    def wrap(self, cog, name, func, kind="handler"):
+        """Return ``func`` timed and counted as ``name`` of ``cog``."""
+        stats = self.stats.setdefault((cog.qualified_name, kind, name), HandlerStats())
+        current = self._current
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = current.set(stats)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                stats.errors[type(e).__name__] += 1
+                raise
+            finally:
+                stats.observe(time.perf_counter() - start)
+                current.reset(token)
+
+        return wrapper
+
+    def record_error(self, cog, error):
+        """Count an exception a handler caught and carried on from."""
+        stats = self._current.get()
+        if stats is None:
+            stats = self.stats.setdefault((cog.qualified_name, "task", "background"), HandlerStats())
+        stats.handled[type(error).__name__] += 1
+
+    def _start(self):
+        http = self.bot.http
+        request = self._request = http.request
+        current = self._current
+
+        @functools.wraps(request)
+        async def counted_request(route, **kwargs):
+            stats = current.get()
+            if stats is not None:
+                stats.rest[f"{route.method} {route.path}"] += 1
+            return await request(route, **kwargs)
+
+        http.request = counted_request
+        self.bot.add_command(pluginstats)
+        if os.environ.get(PORT_VARIABLE):
+            self._endpoint_task = asyncio.create_task(self._serve())
+
+    def _stop(self):
+        if self._request is not None:
+            self.bot.http.request = self._request
+            self._request = None
+        self.bot.remove_command(pluginstats.name)
+        if self._endpoint_task is not None:
+            self._endpoint_task.cancel()
+            self._endpoint_task = None
+
+    async def _serve(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_scrape)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        host = os.environ.get(HOST_VARIABLE, "127.0.0.1")
+        port = int(os.environ[PORT_VARIABLE])
+        try:
+            await web.TCPSite(runner, host, port).start()
+            logger.info("Serving plugin metrics on http://%s:%s/metrics.", host, port)
+            await asyncio.Event().wait()
+        except OSError as e:
+            logger.error("Failed to serve plugin metrics on %s:%s: %s", host, port, e)
+        finally:
+            await runner.cleanup()
+
+    async def _handle_scrape(self, request):
+        return web.Response(text=self.exposition(), content_type="text/plain", charset="utf-8")
+
+    def exposition(self):
+        """The metrics in Prometheus' text exposition format."""
+        histogram = [
+            "# HELP modmail_plugin_handler_seconds Time spent in plugin listeners, commands and handlers.",
+            "# TYPE modmail_plugin_handler_seconds histogram",
+        ]
+        errors = [
+            "# HELP modmail_plugin_handler_errors_total Exceptions in plugin handlers by type.",
+            "# TYPE modmail_plugin_handler_errors_total counter",
+        ]
+        rest = [
+            "# HELP modmail_plugin_rest_requests_total Discord REST requests made by plugin handlers.",
+            "# TYPE modmail_plugin_rest_requests_total counter",
+        ]
+        for (cog, kind, name), stats in sorted(self.stats.items()):
+            labels = f'cog="{_escape(cog)}",kind="{kind}",handler="{_escape(name)}"'
+            seen = 0
+            for bound, count in zip(BUCKETS, stats.buckets):
+                seen += count
+                histogram.append(f'modmail_plugin_handler_seconds_bucket{{{labels},le="{bound}"}} {seen}')
+            histogram.append(f'modmail_plugin_handler_seconds_bucket{{{labels},le="+Inf"}} {stats.calls}')
+            histogram.append(f"modmail_plugin_handler_seconds_sum{{{labels}}} {stats.total}")
+            histogram.append(f"modmail_plugin_handler_seconds_count{{{labels}}} {stats.calls}")
+            for handled, counter in (("false", stats.errors), ("true", stats.handled)):
+                for exception, count in counter.items():
+                    errors.append(
+                        f'modmail_plugin_handler_errors_total{{{labels},exception="{exception}",'
+                        f'handled="{handled}"}} {count}'
+                    )
+            for route, count in stats.rest.items():
+                rest.append(f'modmail_plugin_rest_requests_total{{{labels},route="{_escape(route)}"}} {count}')
+        return "\n".join(histogram + errors + rest) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _milliseconds(seconds):
+    return f"{seconds * 1000:.0f}ms"
+
+
+@commands.command(name="pluginstats")
+@checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+async def pluginstats(ctx, *, plugin: str = None):
+    """
+    Show how often the plugins' listeners and commands ran and how long they took.
+
+    Handlers are sorted by total time spent. `p95` is the upper bound of the
+    latency bucket, `rest` counts Discord API requests and `errors` counts
+    exceptions, raised and caught.
+
+    Show one plugin only with `{prefix}pluginstats <plugin>`.
+    """
+    metrics = ctx.bot.plugin_metrics
+    rows = [
+        (cog, name, stats)
+        for (cog, _, name), stats in metrics.stats.items()
+        if stats.calls or stats.handled
+        if plugin is None or cog.lower() == plugin.lower()
+    ]
+    if not rows:
+        return await ctx.send("No plugin activity recorded yet.")
+
+    rows.sort(key=lambda row: row[2].total, reverse=True)
+    lines = [f"{'handler':34} {'calls':>7} {'mean':>6} {'p95':>7} {'rest':>6} {'errors':>6}"]
+    for cog, name, stats in rows:
+        mean = _milliseconds(stats.total / stats.calls) if stats.calls else "-"
+        p95 = stats.quantile(0.95)
+        p95 = f">{BUCKETS[-1]:g}s" if p95 is None else _milliseconds(p95)
+        errors = sum(stats.errors.values()) + sum(stats.handled.values())
+        line = (
+            f"{f'{cog}.{name}'[:34]:34} {stats.calls:>7} {mean:>6} {p95:>7} "
+            f"{sum(stats.rest.values()):>6} {errors:>6}"
+        )
+        if sum(len(line) + 1 for line in lines) + len(line) > 1900:
+            break
+        lines.append(line)
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
@@ -0,0 +1,633 @@
+import asyncio
+import heapq
+import re
+import time
+from datetime import timedelta, timezone
+from typing import Union, Optional, Any, Literal
+
+import discord
+from discord.ext import commands
+
+from core import checks
+from core.models import getLogger
+from core.thread import Thread, ThreadManager
+from core.time import UserFriendlyTime
+from cogs.utility import PermissionLevel, ModmailHelpCommand
+
+from bot import ModmailBot
+
+from .instrumentation import get_metrics
+
+logger = getLogger(__name__)
+
+# Messages read from a channel's history per log lookup and write.
+EXPORT_BATCH_SIZE = 100
+
+# Bulk suspends run a few threads at a time and pause between them, so a
+# large batch doesn't burn through the channel and message rate limits.
+BULK_CONCURRENCY = 3
+BULK_INTERVAL = 1.0
+PROGRESS_INTERVAL = 5.0
+
+
+class Duration(commands.Converter):
+    """Converts a duration such as `3d`, `12h` or `1d12h30m` to a timedelta."""
+
+    UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes", "s": "seconds"}
+    REGEX = re.compile(r"(\d+)\s*([wdhms])")
+
+    async def convert(self, ctx, argument):
+        argument = argument.lower().replace(" ", "")
+        matches = self.REGEX.findall(argument)
+        if not matches or "".join(a + u for a, u in matches) != argument:
+            raise commands.BadArgument(f"`{argument}` is not a valid duration, e.g. `3d` or `1d12h`.")
+        return timedelta(**{self.UNITS[unit]: int(amount) for amount, unit in matches})
+
+
+class BulkSuspendFlags(commands.FlagConverter):
+    idle: Optional[Duration] = None
+    category: Optional[discord.CategoryChannel] = None
+    recipient: Optional[discord.User] = None
+    message: Optional[str] = None
+    silent: bool = False
+    dryrun: bool = False
+
+
+async def create_with_unsuspend(self: ThreadManager, recipient, *args, **kwargs):
+    cog = self.bot.get_cog("Suspend")
+    # Only a new thread, opened by a DM or the contact command, reattaches a
+    # suspended thread. Reactions, edits and typing in old DMs leave it be.
+    if type(cog) is Suspend and recipient.id in cog.suspended:
+        try:
+            thread = await cog.reopen(recipient.id)
+        except discord.HTTPException as e:
+            logger.error("Failed to reopen suspended thread of %s: %s", recipient.id, e)
+            cog.metrics.record_error(cog, e)
+        else:
+            if thread is not None:
+                return thread
+
+    return await self.old_create(recipient, *args, **kwargs)
+
+
+async def send_with_cancel(self: Thread, *args, **kwargs):
+    cog = self.bot.get_cog("Suspend")
+    # Any thread message cancels a timed suspend, like modmail does for a
+    # scheduled close.
+    if type(cog) is Suspend and self.channel is not None and self.channel.id in cog._scheduled:
+        asyncio.create_task(cog._cancel_on_message(self.channel))
+
+    return await self.old_send(*args, **kwargs)
+
+
+class Suspend(commands.Cog):
+    """
+    Can suspend a thread by closing it normally without deleting the channel.
+    """
+    def __init__(self, bot: ModmailBot):
+        self.bot = bot
+        self.db = bot.plugin_db.get_partition(self)
+        self.suspended = {}  # recipient_id: channel_id of their latest suspended thread
+        self._reopening = {}
+
+        # Timed suspends, ordered by deadline and run by a single task. The
+        # heap can hold stale entries for cancelled suspends, _scheduled is
+        # the source of truth.
+        self._heap = []  # (deadline timestamp, channel_id)
+        self._scheduled = {}  # channel_id: scheduled suspend record
+        self._wakeup = asyncio.Event()
+
+        self.metrics = get_metrics(bot)
+
+        if not hasattr(ThreadManager, "old_create"):
+            ThreadManager.old_create = ThreadManager.create
+        ThreadManager.create = self.metrics.wrap(self, "create", create_with_unsuspend)
+        if not hasattr(Thread, "old_send"):
+            Thread.old_send = Thread.send
+        Thread.send = send_with_cancel
+
+        self.metrics.instrument(self, "_run_scheduled", "_cancel_on_message")
+        asyncio.create_task(self._load_suspended())
+        self._scheduler = asyncio.create_task(self._run_scheduler())
+
+    def cog_unload(self):
+        self.metrics.release(self)
+        self._scheduler.cancel()
+
+    async def _load_suspended(self):
+        async for record in self.db.find({"type": "suspended"}).sort("suspended_at", 1):
+            self.suspended[record["recipient_id"]] = record["channel_id"]
+
+    @staticmethod
+    def _deadline(record):
+        due = record["due"]
+        if due.tzinfo is None:
+            # MongoDB hands back naive UTC datetimes.
+            due = due.replace(tzinfo=timezone.utc)
+        return due.timestamp()
+
+    def _push_scheduled(self, record):
+        self._scheduled[record["channel_id"]] = record
+        heapq.heappush(self._heap, (self._deadline(record), record["channel_id"]))
+        self._wakeup.set()
+
+    async def _run_scheduler(self):
+        await self.bot.wait_until_ready()
+        # Suspends that came due while the bot was offline run right away.
+        async for record in self.db.find({"type": "scheduled"}):
+            self._push_scheduled(record)
+
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            while self._heap:
+                deadline, channel_id = self._heap[0]
+                record = self._scheduled.get(channel_id)
+                if record is None or self._deadline(record) != deadline:
+                    heapq.heappop(self._heap)
+                    continue
+                timeout = deadline - time.time()
+                if timeout > 0:
+                    break
+                heapq.heappop(self._heap)
+                del self._scheduled[channel_id]
+                timeout = None
+                asyncio.create_task(self._run_scheduled(record))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_scheduled(self, record):
+        try:
+            channel = self.bot.modmail_guild.get_channel(record["channel_id"])
+            thread = channel and await self.bot.threads.find(channel=channel)
+            if thread is None:
+                return
+            closer = self.bot.get_user(record["closer_id"]) or self.bot.user
+            await self._suspend_thread(thread, closer, message=record["message"], silent=record["silent"])
+        except Exception as e:
+            logger.error("Scheduled suspend of channel %s failed: %s", record["channel_id"], e)
+            self.metrics.record_error(self, e)
+        finally:
+            await self.db.delete_one({"_id": record["_id"]})
+
+    async def _schedule_suspend(self, thread, closer, due, message, silent):
+        record = {
+            "_id": f"scheduled-{thread.channel.id}",
+            "type": "scheduled",
+            "channel_id": thread.channel.id,
+            "recipient_id": thread.id,
+            "closer_id": closer.id,
+            "message": message,
+            "silent": silent,
+            "due": due,
+        }
+        await self.db.find_one_and_update({"_id": record["_id"]}, {"$set": record}, upsert=True)
+        self._push_scheduled(record)
+
+    async def _cancel_scheduled(self, channel_id):
+        if self._scheduled.pop(channel_id, None) is None:
+            return False
+        await self.db.delete_one({"_id": f"scheduled-{channel_id}"})
+        return True
+
+    async def _cancel_on_message(self, channel):
+        try:
+            if await self._cancel_scheduled(channel.id):
+                embed = discord.Embed(
+                    color=self.bot.error_color, description="Scheduled close has been cancelled."
+                )
+                await channel.send(embed=embed)
+        except Exception as e:
+            logger.error("Failed to cancel the scheduled suspend of channel %s: %s", channel.id, e)
+            self.metrics.record_error(self, e)
+
+    @commands.command(name='suspend', usage="[after] [close message]")
+    @checks.has_permissions(PermissionLevel.SUPPORTER)
+    @checks.thread_only()
+    async def suspend(
+        self,
+        ctx,
+        option: Optional[Literal["silent", "silently", "cancel"]] = "",
+        *,
+        after: UserFriendlyTime = None,
+    ):
+        """
+        Suspend the current thread without deleting the channel.
+
+        Close after a period of time:
+        - `{prefix}close in 5 hours`
+        - `{prefix}close 2m30s`
+
+        Custom close messages:
+        - `{prefix}close 2 hours The issue has been resolved.`
+        - `{prefix}close We will contact you once we find out more.`
+
+        Silently close a thread (no message)
+        - `{prefix}close silently`
+        - `{prefix}close silently in 10m`
+
+        Stop a thread from closing:
+        - `{prefix}close cancel`
+        """
+
+        thread = ctx.thread
+
+        silent = any(x == option for x in {"silent", "silently"})
+        cancel = option == "cancel"
+
+        if cancel:
+            cancelled = await self._cancel_scheduled(thread.channel.id)
+            if thread.close_task is not None or thread.auto_close_task is not None:
+                await thread.cancel_closure(all=True)
+                cancelled = True
+            if cancelled:
+                embed = discord.Embed(
+                    color=self.bot.error_color, description="Scheduled close has been cancelled."
+                )
+            else:
+                embed = discord.Embed(
+                    color=self.bot.error_color,
+                    description="This thread has not already been scheduled to close.",
+                )
+
+            return await ctx.send(embed=embed)
+
+        message = after.arg if after else None
+        if self.bot.config["require_close_reason"] and message is None:
+            raise commands.BadArgument("Provide a reason for closing the thread.")
+
+        if after and after.dt > after.now:
+            cog = self.bot.get_cog('Modmail')
+            await cog.send_scheduled_close_message(ctx, after, silent)
+            # Kept in the database rather than a close task, so it survives restarts.
+            return await self._schedule_suspend(thread, ctx.author, after.dt, message, silent)
+
+        await self._suspend_thread(thread, ctx.author, message=message, silent=silent)
+
+        embed = discord.Embed(
+            title='Thread suspended',
+            description=f'This thread has been suspended by {ctx.author.mention}.',
+            color=self.bot.error_color
+        )
+        embed.set_footer(text=f'Use {self.bot.prefix}unsuspend in this channel to reopen it.')
+        await ctx.send(embed=embed)
+
+    @commands.command(name='unsuspend')
+    @checks.has_permissions(PermissionLevel.SUPPORTER)
+    async def unsuspend(self, ctx):
+        """
+        Reopen the suspended thread of the current channel.
+
+        The thread continues in this channel. A suspended thread is also
+        reopened when its recipient sends a new message or is contacted.
+        """
+        record = await self.db.find_one({"_id": f"suspended-{ctx.channel.id}"})
+        if record is None:
+            embed = discord.Embed(
+                color=self.bot.error_color, description="This channel is not a suspended thread."
+            )
+            return await ctx.send(embed=embed)
+
+        if record["recipient_id"] in self.bot.threads.cache:
+            embed = discord.Embed(
+                color=self.bot.error_color,
+                description="The recipient of this thread already has an open thread.",
+            )
+            return await ctx.send(embed=embed)
+
+        await self.reopen(record["recipient_id"], ctx.channel.id)
+
+    async def reopen(self, recipient_id, channel_id=None):
+        """Reattach a suspended channel as the live thread of its recipient."""
+        task = self._reopening.get(recipient_id)
+        if task is None:
+            channel_id = channel_id or self.suspended.get(recipient_id)
+            if channel_id is None:
+                return None
+            # Messages arriving together must not reopen the thread twice.
+            task = self._reopening[recipient_id] = asyncio.create_task(self._reopen(channel_id))
+            task.add_done_callback(lambda _: self._reopening.pop(recipient_id, None))
+        return await task
+
+    async def _reopen(self, channel_id):
+        record = await self.db.find_one_and_delete({"_id": f"suspended-{channel_id}"})
+        if record is None:
+            return None
+        self._forget(record)
+
+        channel = self.bot.modmail_guild.get_channel(channel_id)
+        if channel is None:
+            return None
+
+        # edit returns the updated channel, the cached one only changes once
+        # the gateway catches up, and modmail finds the thread by its topic.
+        channel = await channel.edit(topic=record["topic"])
+        await self.bot.api.logs.find_one_and_update(
+            {"channel_id": str(channel_id)},
+            {"$set": {"open": True, "closed_at": None, "closer": None, "close_message": None}},
+        )
+        thread = await self.bot.threads.find(channel=channel)
+
+        embed = discord.Embed(
+            title='Thread reopened',
+            description='This suspended thread has been reopened.',
+            color=self.bot.main_color
+        )
+        await channel.send(embed=embed)
+        return thread
+
+    def _forget(self, record):
+        if self.suspended.get(record["recipient_id"]) == record["channel_id"]:
+            del self.suspended[record["recipient_id"]]
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        await self._cancel_scheduled(channel.id)
+        if channel.id in self.suspended.values():
+            record = await self.db.find_one_and_delete({"_id": f"suspended-{channel.id}"})
+            if record is not None:
+                self._forget(record)
+
+    @commands.command(name='suspendexport', usage="[channel] [delete]")
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    async def suspendexport(
+        self,
+        ctx,
+        channel: Optional[discord.TextChannel] = None,
+        option: Optional[Literal["delete"]] = None,
+    ):
+        """
+        Bring the log of a suspended thread channel up to date with the channel.
+
+        Messages sent after the thread was suspended, or that never made it
+        into the log, are appended to it. Logged messages that were edited
+        since get their new content, and the reactions on logged messages are
+        recorded. Messages posted by the bot itself are relays or notices, only
+        their reactions are recorded.
+
+        Export the current channel:
+        - `{prefix}suspendexport`
+
+        Export a channel and delete it afterwards:
+        - `{prefix}suspendexport #channel delete`
+        """
+        channel = channel or ctx.channel
+        log = await self.bot.api.logs.find_one({"channel_id": str(channel.id)}, {"open": True})
+        if log is None or log.get("open"):
+            embed = discord.Embed(
+                color=self.bot.error_color,
+                description=f"{channel.mention} is not a closed thread with a log.",
+            )
+            return await ctx.send(embed=embed)
+
+        exported = updated = 0
+        async for batch in self._history_batches(channel):
+            added, changed = await self._sync_log(channel.id, batch)
+            exported += added
+            updated += changed
+
+        embed = discord.Embed(
+            title='Thread exported',
+            description=(
+                f'Added {exported} missing message(s) from {channel.mention} to the thread log '
+                f'and updated {updated} logged message(s).'
+            ),
+            color=self.bot.main_color
+        )
+        if option == "delete":
+            embed.description += " The channel has been deleted."
+            if channel != ctx.channel:
+                await ctx.send(embed=embed)
+            return await channel.delete(reason=f"Suspended thread exported by {ctx.author}.")
+        await ctx.send(embed=embed)
+
+    async def _history_batches(self, channel):
+        """Stream a channel's history oldest first, a batch at a time."""
+        batch = []
+        async for message in channel.history(limit=None, oldest_first=True):
+            batch.append(message)
+            if len(batch) == EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _logged_entries(self, channel_id, messages):
+        """Return the content and reactions logged for the messages, by message ID."""
+        ids = [str(m.id) for m in messages]
+        # Match IDs inside MongoDB so the log's message list never has to be loaded.
+        pipeline = [
+            {"$match": {"channel_id": str(channel_id)}},
+            {
+                "$project": {
+                    "_id": False,
+                    "found": {
+                        "$map": {
+                            "input": {"$filter": {"input": "$messages", "cond": {"$in": ["$$this.message_id", ids]}}},
+                            "in": {
+                                "message_id": "$$this.message_id",
+                                "content": "$$this.content",
+                                "reactions": "$$this.reactions",
+                            },
+                        }
+                    },
+                }
+            },
+        ]
+        logged = {}
+        async for result in self.bot.api.logs.aggregate(pipeline):
+            logged.update((entry["message_id"], entry) for entry in result["found"])
+        return logged
+
+    async def _sync_log(self, channel_id, messages):
+        """Append the missing messages to the log and update the changed ones, return both counts."""
+        logged = await self._logged_entries(channel_id, messages)
+        missing = []
+        changes = {}
+        array_filters = []
+        for message in messages:
+            entry = logged.get(str(message.id))
+            if entry is None:
+                if message.author != self.bot.user:
+                    missing.append(self._log_entry(message))
+                continue
+
+            changed = {}
+            if message.author != self.bot.user and entry.get("content") != message.content:
+                changed.update(content=message.content, edited=True)
+            reactions = self._reactions(message)
+            if entry.get("reactions", []) != reactions:
+                changed["reactions"] = reactions
+            if changed:
+                name = f"m{len(array_filters)}"
+                array_filters.append({f"{name}.message_id": str(message.id)})
+                changes.update((f"messages.$[{name}].{field}", value) for field, value in changed.items())
+
+        # $set on entries and $push to the list conflict in a single update.
+        if changes:
+            await self.bot.api.logs.update_one(
+                {"channel_id": str(channel_id)}, {"$set": changes}, array_filters=array_filters
+            )
+        if missing:
+            await self.bot.api.logs.update_one(
+                {"channel_id": str(channel_id)},
+                {"$push": {"messages": {"$each": missing}}},
+            )
+        return len(missing), len(array_filters)
+
+    @staticmethod
+    def _reactions(message):
+        return [{"emoji": str(r.emoji), "count": r.count} for r in message.reactions]
+
+    def _log_entry(self, message):
+        return {
+            "timestamp": str(message.created_at),
+            "message_id": str(message.id),
+            "author": {
+                "id": str(message.author.id),
+                "name": message.author.name,
+                "discriminator": message.author.discriminator,
+                "avatar_url": message.author.display_avatar.url,
+                "mod": True,
+            },
+            "content": message.content,
+            "type": "internal",
+            "reactions": self._reactions(message),
+            "attachments": [
+                {
+                    "id": a.id,
+                    "filename": a.filename,
+                    "is_image": a.width is not None,
+                    "size": a.size,
+                    "url": a.url,
+                }
+                for a in message.attachments
+            ],
+        }
+
+    async def _suspend_thread(self, thread, closer, *, message=None, silent=False):
+        # The topic is what lets modmail find the thread, keep it to reopen later.
+        topic = thread.channel.topic
+        await thread.channel.edit(topic=None)
+        await self.db.find_one_and_update(
+            {"_id": f"suspended-{thread.channel.id}"},
+            {
+                "$set": {
+                    "type": "suspended",
+                    "channel_id": thread.channel.id,
+                    "recipient_id": thread.id,
+                    "topic": topic,
+                    "suspended_at": discord.utils.utcnow(),
+                }
+            },
+            upsert=True,
+        )
+        self.suspended[thread.id] = thread.channel.id
+        await thread.close(closer=closer, message=message, silent=silent, delete_channel=False)
+
+    def _select_threads(self, flags):
+        now = discord.utils.utcnow()
+        threads = []
+        for thread in list(self.bot.threads.cache.values()):
+            channel = thread.channel
+            if channel is None:
+                continue
+            if flags.category is not None and channel.category_id != flags.category.id:
+                continue
+            if flags.recipient is not None and thread.id != flags.recipient.id:
+                continue
+            if flags.idle is not None:
+                if channel.last_message_id:
+                    last_activity = discord.utils.snowflake_time(channel.last_message_id)
+                else:
+                    last_activity = channel.created_at
+                if now - last_activity < flags.idle:
+                    continue
+            threads.append(thread)
+        return threads
+
+    def _bulk_embed(self, title, threads, suspended=(), failed=()):
+        embed = discord.Embed(title=title, color=self.bot.main_color)
+        embed.add_field(name="Selected", value=str(len(threads)))
+        if suspended or failed:
+            embed.add_field(name="Suspended", value=str(len(suspended)))
+            embed.add_field(name="Failed", value=str(len(failed)))
+            if failed:
+                value = "\n".join(f"<#{thread.channel.id}>: {error}" for thread, error in failed[:10])
+                if len(value) > 1024:
+                    # Embed field values are capped at 1024 characters.
+                    value = value[:1021] + "..."
+                embed.add_field(name="Failed threads", value=value, inline=False)
+        else:
+            channels = " ".join(thread.channel.mention for thread in threads[:50])
+            if len(threads) > 50:
+                channels += f" and {len(threads) - 50} more"
+            embed.description = channels or "No threads match."
+        return embed
+
+    @commands.command(name='bulksuspend', usage="[idle: <duration>] [category: <category>] [recipient: <user>] [message: <close message>] [silent: yes] [dryrun: yes]")
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    async def bulksuspend(self, ctx, *, flags: BulkSuspendFlags):
+        """
+        Suspend every open thread matching the given filters.
+
+        Threads idle for a while in a category:
+        - `{prefix}bulksuspend idle: 7d category: Support`
+
+        Preview which threads would be suspended:
+        - `{prefix}bulksuspend idle: 2d dryrun: yes`
+
+        Suspend with a close message, or silently:
+        - `{prefix}bulksuspend idle: 14d message: Closing inactive threads.`
+        - `{prefix}bulksuspend recipient: @user silent: yes`
+        """
+        if flags.idle is None and flags.category is None and flags.recipient is None:
+            raise commands.BadArgument("Provide at least one of `idle`, `category` or `recipient`.")
+        if self.bot.config["require_close_reason"] and flags.message is None and not flags.dryrun:
+            raise commands.BadArgument("Provide a reason for closing the threads.")
+
+        threads = self._select_threads(flags)
+        if flags.dryrun or not threads:
+            return await ctx.send(embed=self._bulk_embed("Bulk suspend preview", threads))
+
+        suspended, failed = [], []
+        progress = await ctx.send(embed=self._bulk_embed("Bulk suspend in progress", threads, suspended, failed))
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+        last_update = time.monotonic()
+
+        async def suspend_one(thread):
+            nonlocal last_update
+            async with semaphore:
+                try:
+                    await self._suspend_thread(thread, ctx.author, message=flags.message, silent=flags.silent)
+                except Exception as e:
+                    logger.error("Bulk suspend of channel %s failed: %s", thread.channel.id, e)
+                    self.metrics.record_error(self, e)
+                    failed.append((thread, e))
+                else:
+                    suspended.append(thread)
+                # Holding the slot while pausing paces the whole batch.
+                await asyncio.sleep(BULK_INTERVAL)
+
+            if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+                last_update = time.monotonic()
+                try:
+                    await progress.edit(embed=self._bulk_embed("Bulk suspend in progress", threads, suspended, failed))
+                except discord.HTTPException as e:
+                    # Progress is best effort, the summary is posted at the end either way.
+                    self.metrics.record_error(self, e)
+
+        await asyncio.gather(*(suspend_one(thread) for thread in threads))
+        summary = self._bulk_embed("Bulk suspend finished", threads, suspended, failed)
+        try:
+            await progress.edit(embed=summary)
+        except discord.HTTPException:
+            # The progress message is gone, post the summary on its own.
+            await ctx.send(embed=summary)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Suspend(bot))